@@ -1,11 +1,18 @@
 import json
+import os
+import time
+import trio
+
+from contextlib import asynccontextmanager
+from loguru import logger as L
+from typing import Any, AsyncIterator
 
 from wrapper.jira import JiraUser, JiraIssueStatus
 from wrapper.github import GitHubGraphQlClient, QlUser, QlIssueStatus
 
 
 class BridgeMapping:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, ttl: float = 3600.0):
         with open(config_path, 'r') as file:
             mapping = json.load(file)
 
@@ -20,17 +27,100 @@ class BridgeMapping:
 
             self._mapping[jira_user_id] = github_user_id
 
+        self._ttl = ttl
+
+        # Mapped GitHub users by login, with when they are due for a refresh
+        self._users: dict[str, tuple[QlUser | None, float]] = {}
+
+        self._refreshing: trio.Event | None = None
+        self._refresh_error: Exception | None = None
+
+        # Set while a crawl lets expired users be refreshed in the background
+        self._nursery: trio.Nursery | None = None
+        self._refresh_scheduled = False
+
+    def _is_stale(self) -> bool:
+        now = time.monotonic()
+
+        return any(
+            login not in self._users or self._users[login][1] <= now
+            for login in self._mapping.values()
+        )
+
+    async def refresh(self, ql_client: GitHubGraphQlClient, force: bool = False) -> None:
+        # Lookups arriving while a refresh runs wait for it rather than sending their own
+        if self._refreshing is not None:
+            refreshing = self._refreshing
+            await refreshing.wait()
+
+            if self._refresh_error is not None:
+                raise ValueError(f"Could not resolve mapped GitHub users: {self._refresh_error}") \
+                    from self._refresh_error
+
+            return
+
+        if not force and not self._is_stale():
+            return
+
+        self._refreshing = trio.Event()
+        self._refresh_error = None
+
+        try:
+            logins = sorted(set(self._mapping.values()))
+            users = await ql_client.get_users(logins)
+            expires_at = time.monotonic() + self._ttl
+
+            self._users = {login: (users.get(login), expires_at) for login in logins}
+        except Exception as exception:
+            self._refresh_error = exception
+            raise
+        finally:
+            self._refreshing.set()
+            self._refreshing = None
+
+    async def _refresh_in_background(self, ql_client: GitHubGraphQlClient) -> None:
+        try:
+            await self.refresh(ql_client)
+        except Exception as exception:
+            # Expired users keep being served until a refresh goes through
+            L.warning("Could not refresh mapped GitHub users, keeping the previous ones: {}", exception)
+        finally:
+            self._refresh_scheduled = False
+
+    @asynccontextmanager
+    async def background_refresh(self, ql_client: GitHubGraphQlClient) -> AsyncIterator[None]:
+        async with trio.open_nursery() as nursery:
+            self._nursery = nursery
+
+            try:
+                yield
+            finally:
+                self._nursery = None
+                nursery.cancel_scope.cancel()
+
     async def map(self, ql_client: GitHubGraphQlClient, jira_user: JiraUser) -> QlUser | None:
         if jira_user.id not in self._mapping:
             return None
 
         github_user_id = self._mapping[jira_user.id]
-        github_user = await ql_client.get_user(github_user_id)
+        cached = self._users.get(github_user_id)
 
-        if github_user is None:
+        if cached is None or (cached[1] <= time.monotonic() and self._nursery is None):
+            # Nothing to fall back on, the lookup has to go through first
+            await self.refresh(ql_client)
+            cached = self._users.get(github_user_id)
+        elif cached[1] <= time.monotonic() and not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self._nursery.start_soon(self._refresh_in_background, ql_client)  # type: ignore
+
+        if cached is None or cached[0] is None:
             raise ValueError(f"Github user with ID {github_user_id} not found")
 
-        return github_user
+        return cached[0]
+
+    @property
+    def resolved_users(self) -> int:
+        return sum(1 for user, _ in self._users.values() if user is not None)
 
 
 class JiraIssueStatusMapping:
@@ -43,3 +133,34 @@ class JiraIssueStatusMapping:
                 return QlIssueStatus.IN_PROGRESS
             case JiraIssueStatus.DONE:
                 return QlIssueStatus.DONE
+
+
+class CrawlerState:
+    def __init__(self, state_path: str | None):
+        self._state_path = state_path
+        self._state: dict[str, Any] = {}
+
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path, 'r') as file:
+                self._state = json.load(file)
+
+            if not isinstance(self._state, dict):
+                raise ValueError("Crawler state file must contain a JSON object")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._state.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        self._state[key] = value
+
+    def save(self) -> None:
+        if self._state_path is None:
+            return
+
+        # Write aside then swap, so a crash never leaves a truncated state behind
+        temp_path = f"{self._state_path}.tmp"
+
+        with open(temp_path, 'w') as file:
+            json.dump(self._state, file)
+
+        os.replace(temp_path, self._state_path)
@@ -1,9 +1,13 @@
 from wrapper.github import (
         GitHubGraphQlClient,
+        QlMutationBatch,
         QlUser,
+        QlRepository,
         QlProject,
+        QlProjectItem,
         QlIssueType,
         QlIssue,
+        QlIssueSnapshot,
         QlIssueStatus,
         QlMilestone
 )
@@ -12,9 +16,11 @@ from wrapper.jira import (
         JiraUser,
         JiraProject,
         JiraEpic,
-        JiraIssue
+        JiraIssue,
+        JiraWebhookEvent,
+        JiraWebhookEventType
 )
-from common import BridgeMapping, JiraIssueStatusMapping
+from common import BridgeMapping, CrawlerState, JiraIssueStatusMapping
 
 import github
 import github.Milestone
@@ -23,15 +29,54 @@ from loguru import logger as L
 
 import trio
 
+from datetime import datetime, timedelta, timezone
 from queue import Queue
 from threading import Thread
+from typing import Any, Awaitable, Callable
+
+
+class CrawlerSyncContext:
+    def __init__(self, repository: QlRepository, project: QlProject, issue_type: QlIssueType,
+                 epic_mapping: dict[JiraEpic, QlMilestone], issues: dict[str, QlIssueSnapshot]):
+        self._repository = repository
+        self._project = project
+        self._issue_type = issue_type
+        self._epic_mapping = epic_mapping
+        self._issues = issues
+
+    @property
+    def repository(self) -> QlRepository:
+        return self._repository
+
+    @property
+    def project(self) -> QlProject:
+        return self._project
+
+    @property
+    def issue_type(self) -> QlIssueType:
+        return self._issue_type
+
+    @property
+    def epic_mapping(self) -> dict[JiraEpic, QlMilestone]:
+        return self._epic_mapping
+
+    @property
+    def issues(self) -> dict[str, QlIssueSnapshot]:
+        return self._issues
 
 
 class Crawler:
     MAX_PROJECTS = 25
 
+    # Margin applied to the incremental watermark, covers clock drifts and late commits
+    WATERMARK_SKEW = timedelta(minutes=5)
+    # Full mutation documents waiting for the writer before reconciliations hold off
+    MUTATION_BACKLOG = 2
+
     def __init__(self, jira_server_url: str, jira_token: str, jira_project_id: str,
-                 github_token: str, github_repository: str, bridge_mapping: BridgeMapping):
+                 github_token: str, github_repository: str, bridge_mapping: BridgeMapping,
+                 state: CrawlerState, full_crawl_interval: timedelta = timedelta(hours=24),
+                 max_concurrent_issues: int = 8):
         self._github_rest = github.Github(
             login_or_token=github_token,
             auth=github.Auth.Token(github_token)
@@ -70,12 +115,12 @@ class Crawler:
 
         jira_token_tuple: tuple[str, str] = tuple(jira_token_set[:2]) # type: ignore
 
-        self._jira = JiraClient(jira_server_url, jira_token_tuple)
+        self._jira = trio.run(JiraClient.create, jira_server_url, jira_token_tuple)
 
         L.info("Jira authenticated successfully")
         L.debug("Jira instance is at {}", self._jira.base_url)
 
-        jira_project = self._jira.get_project(jira_project_id)
+        jira_project = trio.run(self._jira.get_project, jira_project_id)
 
         if jira_project is None:
             raise ValueError(f"Jira project {jira_project_id} not found")
@@ -84,6 +129,22 @@ class Crawler:
 
         self._bridge_mapping = bridge_mapping
 
+        # Every mapped GitHub user is resolved up front, in a single query
+        trio.run(self._bridge_mapping.refresh, self._github_graphql)
+        L.debug("Resolved {} mapped GitHub users", self._bridge_mapping.resolved_users)
+
+        self._state = state
+        self._full_crawl_interval = full_crawl_interval
+
+        if max_concurrent_issues < 1:
+            raise ValueError(f"Invalid issue concurrency {max_concurrent_issues}")
+
+        # Issues reconciled at once, their requests still go through the GitHub rate limiter
+        self._issue_limiter = trio.CapacityLimiter(max_concurrent_issues)
+
+        # What the last crawl learned about GitHub, reused by single-issue synchronizations
+        self._sync_context: CrawlerSyncContext | None = None
+
     def _create_epic_title(self, jira_epic: JiraEpic) -> str:
         return f"[{jira_epic.id}] {jira_epic.name}"
 
@@ -101,44 +162,153 @@ class Crawler:
     def _create_issue_title(self, jira_issue: JiraIssue) -> str:
         return f"[{jira_issue.id}] {jira_issue.name}"
 
+    @staticmethod
+    def _issue_key(title: str) -> str:
+        # GitHub issues are matched on the Jira key their title starts with, so a renamed
+        # task updates its issue; issues without one keep their whole title as a key
+        if title.startswith("[") and "]" in title:
+            return title[1:title.index("]")]
+
+        return title
+
+    async def _map_assignee(self, jira_issue: JiraIssue) -> QlUser | None:
+        source_user: JiraUser | None = await jira_issue.get_assignee()
+
+        if source_user is None:
+            return None
+
+        mapped_user = await self._bridge_mapping.map(self._github_graphql, source_user)
+
+        if mapped_user:
+            L.trace("Found mapped user {} for Jira user {}", mapped_user.login, source_user.id)
+        else:
+            L.warning("No mapping found for Jira user {}, please check your user mapping file", source_user.id)
+
+        return mapped_user
+
     async def _transform_issue(self, epic_mapping: dict[JiraEpic, QlMilestone],
-                               ql_issue: QlIssue, jira_issue: JiraIssue):
+                               ql_issue: QlIssue, jira_issue: JiraIssue, batch: QlMutationBatch):
         L.debug("Transforming Jira task {} ({})", jira_issue.id, jira_issue.name)
 
-        source_user: JiraUser | None = jira_issue.assignee
-        mapped_user: QlUser | None = None
+        mapped_user = await self._map_assignee(jira_issue)
 
         ql_issue.title = self._create_issue_title(jira_issue)
         ql_issue.body_text = jira_issue.description
         ql_issue.milestone = epic_mapping.get(jira_issue.epic) if jira_issue.epic else None
 
-        if source_user is not None:
-            mapped_user = await self._bridge_mapping.map(self._github_graphql, source_user)
+        if mapped_user is not None:
+            ql_issue.assigned_users = [mapped_user]
 
-            if len(ql_issue.assigned_users) == 1 and ql_issue.assigned_users[0] == mapped_user:
-                L.trace("GitHub issue {} already assigned to user {}, skipping",
-                        ql_issue.title, source_user.id)
-            else:
-                L.trace("Assigning GitHub issue {} to user {}", ql_issue.title, source_user.id)
-
-                if mapped_user:
-                    L.trace("Found mapped user {} for Jira user {}",
-                            mapped_user.login, source_user.id)
-
-                    ql_issue.assigned_users = [mapped_user]
-                else:
-                    L.warning("No mapping found for Jira user {}, please check your user mapping file", source_user.id)
+        # Only the fields that differ from GitHub are sent, if any
+        if not await ql_issue.update(batch):
+            L.trace("GitHub issue {} already matches Jira task {}, skipping", ql_issue.title, jira_issue.id)
+            return
 
-        await ql_issue.update()
         L.debug("Updated GitHub issue {} with Jira task {} ({})",
                 ql_issue.title, jira_issue.id, jira_issue.name)
 
+    async def _create_issue(self, context: CrawlerSyncContext, jira_issue: JiraIssue) -> QlIssue:
+        L.debug("Creating new GitHub issue for Jira task {} ({})", jira_issue.id, jira_issue.name)
+
+        mapped_user = await self._map_assignee(jira_issue)
+
+        # Created with its final content, only the project membership and status follow
+        return await context.repository.create_issue(
+            context.issue_type,
+            self._create_issue_title(jira_issue),
+            jira_issue.description,
+            milestone=context.epic_mapping.get(jira_issue.epic) if jira_issue.epic else None,
+            assigned_users=[mapped_user] if mapped_user else None
+        )
+
     def _transform_issue_status(self, jira_issue: JiraIssue) -> QlIssueStatus:
         return JiraIssueStatusMapping.for_(jira_issue.status)
 
-    async def crawl(self):
-        L.info("Initiated synchronization from Jira to GitHub")
+    async def _reconcile_issue(self, context: CrawlerSyncContext, jira_issue: JiraIssue,
+                               batch: QlMutationBatch):
+        ql_snapshot = context.issues.get(jira_issue.id)
+
+        if ql_snapshot is not None:
+            ql_issue = QlIssue.from_snapshot(self._github_graphql, ql_snapshot)
+            await self._transform_issue(context.epic_mapping, ql_issue, jira_issue, batch)
+        else:
+            ql_issue = await self._create_issue(context, jira_issue)
+
+        context.issues[jira_issue.id] = ql_issue.snapshot
+
+        # Issues already in the project are skipped by the item index
+        L.trace("Updating issue from the project's perspective")
+        await context.project.add_issue(ql_issue, batch)
+        await context.project.set_issue_status(ql_issue, self._transform_issue_status(jira_issue), batch)
+
+    async def _reconcile_issue_slot(self, context: CrawlerSyncContext, jira_issue: JiraIssue,
+                                    batch: QlMutationBatch,
+                                    task_status: trio.TaskStatus[None] = trio.TASK_STATUS_IGNORED):
+        async with self._issue_limiter:
+            # Only hand back once a slot is taken, so the Jira stream waits for free ones
+            task_status.started()
+            await self._reconcile_issue(context, jira_issue, batch)
+
+    async def _close_issue(self, context: CrawlerSyncContext, ql_snapshot: QlIssueSnapshot,
+                           batch: QlMutationBatch):
+        if ql_snapshot.closed:
+            L.trace("GitHub issue {} already closed, skipping", ql_snapshot.title)
+            return
+
+        L.info("Closing GitHub issue {} ({})", ql_snapshot.title, ql_snapshot.id)
+        ql_issue = QlIssue.from_snapshot(self._github_graphql, ql_snapshot)
+        ql_issue.closed = True
+        await ql_issue.update(batch)
+
+        context.issues[self._issue_key(ql_snapshot.title)] = ql_issue.snapshot
+
+    @staticmethod
+    async def _collect(into: list, fetcher: Callable[..., Awaitable[list]], *args: Any):
+        into.extend(await fetcher(*args))
+
+    @staticmethod
+    async def _collect_issue_snapshots(into: dict[str, QlIssueSnapshot], repository: QlRepository):
+        # Only the compact records are kept around for the reconciliation
+        async with repository.stream_issues() as ql_issue_pages:
+            async for ql_issue_page in ql_issue_pages:
+                into.update((Crawler._issue_key(ql_issue.title), ql_issue.snapshot) for ql_issue in ql_issue_page)
+
+    def _restore_project_items(self, ql_project: QlProject) -> bool:
+        saved_items = self._state.get("project_items")
+
+        if not saved_items or saved_items.get("project_id") != ql_project.id:
+            return False
+
+        ql_project.restore_items({
+            content_id: QlProjectItem(id=item_id, status_option_id=status_option_id)
+            for content_id, (item_id, status_option_id) in saved_items["items"].items()
+        })
+
+        return True
+
+    def _store_project_items(self, ql_project: QlProject):
+        self._state.set("project_items", {
+            "project_id": ql_project.id,
+            "items": {
+                content_id: [item.id, item.status_option_id]
+                for content_id, item in ql_project.items.items()
+            }
+        })
+
+    def _resolve_watermark(self, now: datetime, full: bool | None) -> datetime | None:
+        watermark = self._state.get("watermark")
+        last_full_sync = self._state.get("last_full_sync")
+
+        if full or watermark is None or last_full_sync is None:
+            return None
+
+        if full is None and now - datetime.fromisoformat(last_full_sync) >= self._full_crawl_interval:
+            L.info("Last full synchronization is older than {}, running a full one", self._full_crawl_interval)
+            return None
 
+        return datetime.fromisoformat(watermark) - self.WATERMARK_SKEW
+
+    async def _build_sync_context(self, updated_since: datetime | None) -> CrawlerSyncContext | None:
         rs_github_repo = self._github_rest.get_repo(
             f"{self._github_organization_name}/{self._github_repository}"
         )
@@ -170,15 +340,31 @@ class Crawler:
 
         if ql_target_issue_type is None:
             L.error("Target issue type 'Task' not found in GitHub project, something is wrong")
-            return
+            return None
+
+        jira_epics: list[JiraEpic] = []
+        ql_issues: dict[str, QlIssueSnapshot] = {}
+
+        # Jira and GitHub reads do not depend on each other, let them overlap
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self._collect, jira_epics, self._jira_project.get_epics)
+            nursery.start_soon(self._collect_issue_snapshots, ql_issues, ql_target_repo)
+
+            # Full crawls rebuild the project item index, incremental ones start from the saved one
+            # and confirm the membership of the issues they touch by adding them again
+            if updated_since is None or not self._restore_project_items(ql_target_project):
+                nursery.start_soon(ql_target_project.load_items)
 
         rs_milestones = rs_github_repo.get_milestones(state="open")
         rs_milestones = {milestone.title: milestone for milestone in rs_milestones}
 
-        jira_epics = self._jira_project.get_epics()
         L.info("Found {} Jira epics in project {}", len(jira_epics), self._jira_project.name)
 
         for jira_epic in jira_epics:
+            # Epics are few and all needed for the mapping, only the changed ones are rewritten
+            if updated_since is not None and jira_epic.updated < updated_since:
+                continue
+
             trsf_epic_name = f"[{jira_epic.id}] {jira_epic.name}"
             rs_milestone = rs_milestones.get(trsf_epic_name)
 
@@ -202,55 +388,145 @@ class Crawler:
 
         L.debug("Epic to milestone mapping created with {} entries", len(epic_mapping))
 
-        jira_issues = self._jira_project.get_issues()
+        L.debug("Found {} GitHub issues in project {}", len(ql_issues), self._github_project_name)
 
-        L.trace("Found {} Jira issues in project {}", len(jira_issues), self._jira_project.name)
+        L.info("Updating target GitHub project with Jira tasks on {} ({} present)",
+               self._github_repository, len(ql_issues))
 
-        ql_issues = await ql_target_repo.get_issues()
-        ql_issues = {issue.title: issue for issue in ql_issues}
+        return CrawlerSyncContext(ql_target_repo, ql_target_project, ql_target_issue_type,
+                                  epic_mapping, ql_issues)
 
-        L.debug("Found {} GitHub issues in project {}", len(ql_issues), self._github_project_name)
+    async def crawl(self, full: bool | None = None):
+        sync_started_at = datetime.now(timezone.utc)
+        updated_since = self._resolve_watermark(sync_started_at, full)
 
-        L.info("Updating target GitHub project with {} Jira tasks on {} ({} present)",
-               len(jira_issues), self._github_repository, len(ql_issues))
+        if updated_since is None:
+            L.info("Initiated full synchronization from Jira to GitHub")
+        else:
+            L.info("Initiated incremental synchronization from Jira to GitHub (updated since {})",
+                   updated_since.isoformat())
 
-        ql_issues_to_delete = [
-            ql_issue for ql_issue in ql_issues.values()
-            if not any(ql_issue.title == self._create_issue_title(jira_issue)
-                       for jira_issue in jira_issues)
-        ]
+        self._jira.reset_session()
+        self._github_graphql.reset_session()
 
-        L.info("Found {} GitHub issues that need to be closed", len(ql_issues_to_delete))
-        for ql_issue in ql_issues_to_delete:
-            if ql_issue.closed:
-                L.trace("GitHub issue {} already closed, skipping", ql_issue.title)
-                continue
+        # Mapped users that expire during the crawl are refreshed in the background, serving until then
+        # Jira tasks are fetched while GitHub is indexed, up to SEARCH_PREFETCH_PAGES past the first page
+        async with self._bridge_mapping.background_refresh(self._github_graphql), \
+                self._jira_project.stream_issues(updated_since) as jira_issue_pages:
+            context = await self._build_sync_context(updated_since)
 
-            L.info("Closing GitHub issue {} ({})", ql_issue.title, ql_issue.id)
-            ql_issue.closed = True
-            await ql_issue.update()
+            if context is None:
+                return
 
-        for jira_issue in jira_issues:
-            trsf_issue_name = self._create_issue_title(jira_issue)
-            ql_issue = ql_issues.get(trsf_issue_name)
+            # Jira tasks are reconciled page by page as they arrive, only their keys are kept
+            jira_issue_keys: set[str] = set()
 
-            if ql_issue is None:
-                L.trace("Creating new GitHub issue for Jira task {} ({})", jira_issue.id, jira_issue.name)
-                ql_issue = await ql_target_repo.create_issue(
-                    ql_target_issue_type,
-                    f"[SYNCING] {trsf_issue_name}",
-                    "This issue is currently being synchronized from Jira, please wait."
-                )
+            # GitHub writes are queued and sent as aliased documents of several mutations
+            async with self._github_graphql.batch() as batch, trio.open_nursery() as writer:
+                # Full documents go out from their own task, reconciliations only wait on a full backlog
+                await writer.start(batch.write, self.MUTATION_BACKLOG)
+
+                # Issues are independent from each other, several are reconciled at once
+                async with trio.open_nursery() as nursery:
+                    async for jira_issues in jira_issue_pages:
+                        L.trace("Received {} Jira issues from project {}", len(jira_issues), self._jira_project.name)
+
+                        for jira_issue in jira_issues:
+                            # A task updated mid-crawl can show up on two pages, do not create it twice
+                            if jira_issue.id in jira_issue_keys:
+                                continue
+
+                            jira_issue_keys.add(jira_issue.id)
+                            await nursery.start(self._reconcile_issue_slot, context, jira_issue, batch)
+
+                L.info("Synchronized {} Jira tasks from project {}", len(jira_issue_keys), self._jira_project.name)
+
+                # Deleted Jira tasks do not show up in an incremental search, leave that to full crawls
+                ql_issues_to_delete = [
+                    ql_snapshot for issue_key, ql_snapshot in context.issues.items()
+                    if issue_key not in jira_issue_keys
+                ] if updated_since is None else []
+
+                L.info("Found {} GitHub issues that need to be closed", len(ql_issues_to_delete))
+                for ql_snapshot in ql_issues_to_delete:
+                    await self._close_issue(context, ql_snapshot, batch)
+
+                # Whatever the writer was not handed is flushed when the batch closes
+                await batch.close_writer()
+
+        self._sync_context = context
+
+        L.info("Jira session cache: {} hits, {} misses",
+                self._jira.session_hits, self._jira.session_misses)
+        L.info("GitHub mutations: {} sent, {} skipped as no-ops",
+               self._github_graphql.session_mutations_sent, self._github_graphql.session_mutations_skipped)
+        L.info("GitHub documents: {} rendered, {} reused from the document cache",
+               self._github_graphql.session_documents_rendered, self._github_graphql.session_documents_reused)
+        L.info("GitHub rate limit: {} of {} points left, reset at {}",
+               self._github_graphql.rate_limit.remaining, self._github_graphql.rate_limit.limit,
+               self._github_graphql.rate_limit.reset_at)
 
-            await self._transform_issue(epic_mapping, ql_issue, jira_issue)
+        for service, retries in (("Jira", self._jira.retries), ("GitHub", self._github_graphql.retries)):
+            L.info("{} retries: {} over {} requests ({}), {} gave up, {:.1f}s spent waiting",
+                   service, retries.retries, retries.requests, retries.retries_by_reason or "none",
+                   retries.exhausted, retries.waited)
 
-            # Whether if it's already there or not, GitHub accepts it
-            L.trace("Updating issue from the project's perspective")
-            await ql_target_project.add_issue(ql_issue)
-            await ql_target_project.set_issue_status(ql_issue, self._transform_issue_status(jira_issue))
+        self._store_project_items(context.project)
+        self._state.set("watermark", sync_started_at.isoformat())
+
+        if updated_since is None:
+            self._state.set("last_full_sync", sync_started_at.isoformat())
+
+        self._state.save()
 
         L.info("Synchronization from Jira to GitHub completed successfully. Goodbye world!")
 
+    async def sync_issue(self, event: JiraWebhookEvent):
+        if event.project_id != self._jira_project.id:
+            L.debug("Ignoring webhook event for Jira issue {} outside of project {}",
+                    event.issue_key, self._jira_project.name)
+            return
+
+        context = self._sync_context
+
+        # Epics drive the milestones, which only a crawl reconciles
+        if context is None or event.issue_type == "Epic":
+            L.info("Webhook event for Jira issue {} needs a crawl", event.issue_key)
+            await self.crawl()
+            return
+
+        if event.issue_type != "Task":
+            L.debug("Ignoring webhook event for Jira {} {}", event.issue_type, event.issue_key)
+            return
+
+        L.info("Initiated synchronization of Jira task {} from a webhook event", event.issue_key)
+
+        jira_issue = self._jira.resolve_issue(JiraIssue, event.issue)
+
+        if event.type != JiraWebhookEventType.ISSUE_DELETED \
+                and jira_issue.epic is not None and jira_issue.epic not in context.epic_mapping:
+            L.info("Jira task {} belongs to an unknown epic, running a crawl", jira_issue.id)
+            await self.crawl()
+            return
+
+        # The board may have changed since the crawl that indexed it
+        context.project.expire_items()
+
+        async with self._bridge_mapping.background_refresh(self._github_graphql), \
+                self._github_graphql.batch() as batch:
+            if event.type == JiraWebhookEventType.ISSUE_DELETED:
+                ql_snapshot = context.issues.get(jira_issue.id)
+
+                if ql_snapshot is not None:
+                    await self._close_issue(context, ql_snapshot, batch)
+            else:
+                await self._reconcile_issue(context, jira_issue, batch)
+
+        self._store_project_items(context.project)
+        self._state.save()
+
+        L.info("Synchronization of Jira task {} completed successfully", jira_issue.id)
+
 
 class CrawlerWorker:
     def __init__(self, crawler: Crawler):
@@ -264,13 +540,16 @@ class CrawlerWorker:
 
     def _worker(self):
         while True:
-            context = self._work_queue.get() # pyright: ignore[reportUnusedExpression]
+            context = self._work_queue.get()
             L.info("Received work task")
 
-            trio.run(self._crawler.crawl)
+            if context is None:
+                trio.run(self._crawler.crawl)
+            else:
+                trio.run(self._crawler.sync_issue, context)
 
             L.info("Done working on the task")
 
-    def commit(self, context: None):
+    def commit(self, context: JiraWebhookEvent | None):
         self._work_queue.put(context)
         L.debug("Commited work task")
@@ -1,6 +1,7 @@
 from crawler import Crawler, CrawlerWorker
+from wrapper.jira import JiraWebhookEvent
 
-from flask import Flask
+from flask import Flask, request
 
 from gevent.pywsgi import WSGIServer
 from gevent import ssl
@@ -35,7 +36,15 @@ class WebhookListener:
 
         @self._app.post("/")
         def on_event():
-            self._worker.commit(None)
+            payload = request.get_json(silent=True)
+
+            # Anything that is not a Jira issue event falls back to a full crawl
+            event = JiraWebhookEvent.from_payload(payload) if isinstance(payload, dict) else None
+
+            if event is not None:
+                L.debug("Received {} webhook event for Jira issue {}", event.type.value, event.issue_key)
+
+            self._worker.commit(event)
             return "", 200
 
     def run(self):
@@ -19,6 +19,8 @@ SV_SERVICE_VENV_FNAME=".env"
 SV_SERVICE_VENV_PATH="$SV_INSTALL_PATH/$SV_SERVICE_VENV_FNAME"
 SV_SERVICE_MAPPING_FNAME="mapping.json"
 SV_SERVICE_MAPPING_PATH="$SV_INSTALL_PATH/$SV_SERVICE_MAPPING_FNAME"
+SV_SERVICE_STATE_FNAME="state.json"
+SV_SERVICE_STATE_PATH="$SV_INSTALL_PATH/$SV_SERVICE_STATE_FNAME"
 
 sv_require()
 {
@@ -400,6 +402,7 @@ CW_JIRA_PROJECT_ID=$jira_project_id
 CW_GITHUB_TOKEN=$github_token
 CW_GITHUB_TARGET="$target_project"
 CW_BRIDGE_MAPPING=$SV_SERVICE_MAPPING_PATH
+CW_STATE_PATH=$SV_SERVICE_STATE_PATH
 EOF
 
     sv_status_show "Installing the service script file"
@@ -6,7 +6,9 @@ import trio
 from crawler import Crawler
 from hosting import WebhookListener
 
-from common import BridgeMapping
+from common import BridgeMapping, CrawlerState
+
+from datetime import timedelta
 
 from typing import Optional
 import os
@@ -35,6 +37,13 @@ for env_var_name, global_var_name in env_set.items():
 host = bool(os.getenv("CW_HOST", None))
 host_cert = os.getenv("CW_HOST_CERT", None)
 
+state_path = os.getenv("CW_STATE_PATH", None)
+full_crawl_interval = os.getenv("CW_FULL_CRAWL_INTERVAL", "24")
+max_concurrent_issues = os.getenv("CW_MAX_CONCURRENT_ISSUES", "8")
+
+if state_path is None:
+    L.warning("No state path provided, every synchronization will be a full one.")
+
 if host: # type: ignore
     L.info("Starting as a self-sustaining updater through a webhook endpoint.")
 
@@ -45,7 +54,10 @@ try:
         jira_project_id=jira_project_id, # type: ignore
         github_token=github_token, # type: ignore
         github_repository=github_repository, # type: ignore
-        bridge_mapping=BridgeMapping(bridge_mapping_config_path) # type: ignore
+        bridge_mapping=BridgeMapping(bridge_mapping_config_path), # type: ignore
+        state=CrawlerState(state_path),
+        full_crawl_interval=timedelta(hours=float(full_crawl_interval)),
+        max_concurrent_issues=int(max_concurrent_issues)
     )
 except Exception as e:
     L.error(f"Error while instanciating crawler: {e}")
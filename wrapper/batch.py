@@ -0,0 +1,181 @@
+from .graphql_client import Client
+from .graphql_client.base_operation import GraphQLField
+from .graphql_client.exceptions import GraphQLClientGraphQLError, GraphQLClientGraphQLMultiError
+
+from typing import Any, Callable, Dict
+
+import trio
+
+
+class QlMutationResult:
+    def __init__(self, alias: str, on_done: Callable[[Dict[str, Any]], None] | None = None):
+        self._alias = alias
+        self._on_done = on_done
+
+        self._done = False
+        self._data: Dict[str, Any] | None = None
+        self._error: Exception | None = None
+
+    def _resolve(self, data: Dict[str, Any] | None, error: Exception | None) -> None:
+        self._done = True
+        self._data = data
+        self._error = error
+
+        if error is None and self._on_done is not None:
+            self._on_done(data or {})
+
+    @property
+    def alias(self) -> str:
+        return self._alias
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def error(self) -> Exception | None:
+        return self._error
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        if not self._done:
+            raise ValueError(f"Mutation {self._alias} has not been flushed yet")
+
+        if self._error is not None:
+            raise self._error
+
+        return self._data or {}
+
+
+class QlMutationBatch:
+    def __init__(self, client: Client, batch_size: int, operation_name: str = "batch"):
+        if batch_size < 1:
+            raise ValueError(f"Invalid mutation batch size {batch_size}")
+
+        self._client = client
+        self._batch_size = batch_size
+        self._operation_name = operation_name
+
+        self._pending: list[tuple[GraphQLField, QlMutationResult]] = []
+
+        # Set while a writer task sends the full documents in the background
+        self._documents: trio.MemorySendChannel[list[tuple[GraphQLField, QlMutationResult]]] | None = None
+
+    async def __aenter__(self) -> "QlMutationBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        # Leave the queued mutations alone if the caller failed halfway
+        if exc_type is None:
+            # Callbacks may defer follow-up mutations while the last ones are flushed
+            while self._pending:
+                await self.flush()
+
+    def defer(self, field: GraphQLField,
+              on_done: Callable[[Dict[str, Any]], None] | None = None) -> QlMutationResult:
+        # Aliases keep the results of identical mutations apart within a document, and
+        # restart with each one so documents of the same shape print the same
+        result = QlMutationResult(f"m{len(self._pending)}", on_done)
+        self._pending.append((field.alias(result.alias), result))
+
+        return result
+
+    async def add(self, field: GraphQLField,
+                  on_done: Callable[[Dict[str, Any]], None] | None = None) -> QlMutationResult:
+        result = self.defer(field, on_done)
+
+        if len(self._pending) >= self._batch_size:
+            if self._documents is None:
+                await self.flush()
+            else:
+                # Only waits when the writer has fallen behind by its whole backlog
+                pending, self._pending = self._pending, []
+                await self._documents.send(pending)
+
+        return result
+
+    async def write(self, backlog: int = 1,
+                    task_status: trio.TaskStatus[None] = trio.TASK_STATUS_IGNORED) -> None:
+        if self._documents is not None:
+            raise ValueError("Mutation batch already has a writer")
+
+        send_channel, receive_channel = trio.open_memory_channel[
+            list[tuple[GraphQLField, QlMutationResult]]
+        ](backlog)
+
+        self._documents = send_channel
+        task_status.started()
+
+        try:
+            async with receive_channel:
+                async for pending in receive_channel:
+                    await self._send(pending)
+        finally:
+            if self._documents is send_channel:
+                self._documents = None
+
+    async def close_writer(self) -> None:
+        # The writer sends what it was handed and returns, later mutations are flushed inline
+        documents, self._documents = self._documents, None
+
+        if documents is not None:
+            await documents.aclose()
+
+    async def flush(self) -> list[QlMutationResult]:
+        if not self._pending:
+            return []
+
+        pending, self._pending = self._pending, []
+
+        return await self._send(pending)
+
+    async def _send(self, pending: list[tuple[GraphQLField, QlMutationResult]]) -> list[QlMutationResult]:
+        fields = [field for field, _ in pending]
+        errors: Dict[str, GraphQLClientGraphQLError] = {}
+
+        try:
+            data = await self._client.mutation(*fields, operation_name=self._operation_name)
+        except GraphQLClientGraphQLMultiError as multi_error:
+            data = multi_error.data or {}
+
+            for error in multi_error.errors:
+                # Errors without a path cannot be told apart, they fail the whole document
+                alias = error.path[0] if error.path else None
+
+                if alias is None:
+                    for _, result in pending:
+                        result._resolve(None, multi_error)
+
+                    raise
+
+                errors.setdefault(str(alias), error)
+        except Exception as exception:
+            for _, result in pending:
+                result._resolve(None, exception)
+
+            raise
+
+        for _, result in pending:
+            result._resolve(data.get(result.alias), errors.get(result.alias))
+
+        failed = [result for _, result in pending if result.error is not None]
+
+        # Lone mutations keep their original error
+        if failed and len(pending) == 1:
+            raise failed[0].error  # type: ignore
+
+        if failed:
+            raise ValueError(
+                f"{len(failed)} of {len(pending)} batched mutations failed: " +
+                "; ".join(f"{result.alias}: {result.error}" for result in failed)
+            )
+
+        return [result for _, result in pending]
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,221 @@
+from .graphql_client import Client
+from .graphql_client.base_operation import GraphQLField
+
+from graphql import (
+    DocumentNode,
+    NamedTypeNode,
+    NameNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    VariableDefinitionNode,
+    VariableNode,
+    print_ast
+)
+from typing import Any, Callable, Dict, Tuple
+
+import inspect
+
+
+# Per field, in walk order: which argument feeds which document variable
+Bindings = Tuple[Tuple[Tuple[str, str], ...], ...]
+
+
+def _walk(field: GraphQLField, into: list[GraphQLField]) -> None:
+    # Same order as GraphQLField.to_ast() names the variables in
+    into.append(field)
+
+    for subfield in field._subfields:
+        _walk(subfield, into)
+
+    for subfields in field._inline_fragments.values():
+        for subfield in subfields:
+            _walk(subfield, into)
+
+
+def _shape(field: GraphQLField) -> Tuple[Any, ...]:
+    return (
+        field._field_name,
+        field._alias,
+        tuple((name, variable["type"]) for name, variable in field._variables.items()),
+        len(field._subfields),
+        tuple((type_name, len(subfields)) for type_name, subfields in field._inline_fragments.items())
+    )
+
+
+def _render(fields: Tuple[GraphQLField, ...], operation_type: OperationType,
+            operation_name: str) -> Tuple[str, list[GraphQLField]]:
+    # Mirrors Client.execute_custom_operation(), minus the request
+    selections = [field.to_ast(idx) for idx, field in enumerate(fields)]
+
+    walked: list[GraphQLField] = []
+
+    for field in fields:
+        _walk(field, walked)
+
+    variable_definitions = [
+        VariableDefinitionNode(
+            variable=VariableNode(name=NameNode(value=name)),
+            type=NamedTypeNode(name=NameNode(value=variable["type"]))
+        )
+        for field in walked
+        for name, variable in field.formatted_variables.items()
+    ]
+
+    operation_ast = DocumentNode(
+        definitions=[
+            OperationDefinitionNode(
+                operation=operation_type,
+                name=NameNode(value=operation_name),
+                variable_definitions=variable_definitions,
+                selection_set=SelectionSetNode(selections=selections)
+            )
+        ]
+    )
+
+    return print_ast(operation_ast), walked
+
+
+class QlParameter:
+    # Stands in for a call argument while a template is rendered
+    def __init__(self, name: str):
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+
+class QlOperationTemplate:
+    def __init__(self, operation_type: OperationType, operation_name: str,
+                 build: Callable[..., GraphQLField], response_path: Tuple[str, ...]):
+        self._operation_name = operation_name
+        self._response_path = response_path
+
+        self._parameters = tuple(inspect.signature(build).parameters)
+        field = build(**{name: QlParameter(name) for name in self._parameters})
+
+        self._query, walked = _render((field,), operation_type, operation_name)
+
+        self._variable_types: Dict[str, str] = {}
+        self._bindings: Dict[str, str] = {}
+        self._constants: Dict[str, Any] = {}
+
+        for walked_field in walked:
+            for name, variable in walked_field.formatted_variables.items():
+                self._variable_types[name] = variable["type"]
+
+                if isinstance(variable["value"], QlParameter):
+                    self._bindings[name] = variable["value"].name
+                else:
+                    self._constants[name] = variable["value"]
+
+    def bind(self, **arguments: Any) -> Dict[str, Any]:
+        if set(arguments) != set(self._parameters):
+            raise ValueError(
+                f"Operation {self._operation_name} takes {', '.join(self._parameters)}, "
+                f"got {', '.join(arguments)}"
+            )
+
+        variables = dict(self._constants)
+        variables.update({name: arguments[parameter] for name, parameter in self._bindings.items()})
+
+        return variables
+
+    async def execute(self, client: Client, **arguments: Any) -> Any:
+        response = await client.execute(
+            self._query,
+            variables=self.bind(**arguments),
+            operation_name=self._operation_name
+        )
+
+        data = client.get_data(response)
+
+        for key in self._response_path:
+            # Nullable objects end the path early, e.g. a missing milestone
+            if data is None:
+                return None
+
+            data = data[key]
+
+        return data
+
+    @property
+    def query(self) -> str:
+        return self._query
+
+    @property
+    def variable_types(self) -> Dict[str, str]:
+        return self._variable_types
+
+    @property
+    def parameters(self) -> Tuple[str, ...]:
+        return self._parameters
+
+    @property
+    def response_path(self) -> Tuple[str, ...]:
+        return self._response_path
+
+
+class CachedDocumentClient(Client):
+    DOCUMENT_CACHE_SIZE = 256
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+
+        self._documents: Dict[Tuple[Any, ...], Tuple[str, Bindings]] = {}
+        self._document_hits = 0
+        self._document_misses = 0
+
+    async def execute_custom_operation(
+        self, *fields: GraphQLField, operation_type: OperationType, operation_name: str
+    ) -> Dict[str, Any]:
+        walked: list[GraphQLField] = []
+
+        for field in fields:
+            _walk(field, walked)
+
+        # Variable names only depend on the shape and position of the fields, not their values
+        key = (operation_type, operation_name, len(fields), tuple(_shape(field) for field in walked))
+        document = self._documents.get(key)
+
+        if document is None:
+            self._document_misses += 1
+
+            query, rendered = _render(fields, operation_type, operation_name)
+
+            # to_ast() left the variable names it picked on each field
+            document = query, tuple(
+                tuple((variable["name"], name) for name, variable in field.formatted_variables.items())
+                for field in rendered
+            )
+
+            if len(self._documents) >= self.DOCUMENT_CACHE_SIZE:
+                del self._documents[next(iter(self._documents))]
+
+            self._documents[key] = document
+        else:
+            self._document_hits += 1
+
+        query, bindings = document
+        variables = {
+            name: field._variables[argument]["value"]
+            for field, field_bindings in zip(walked, bindings)
+            for argument, name in field_bindings
+        }
+
+        response = await self.execute(query, variables=variables, operation_name=operation_name)
+        return self.get_data(response)
+
+    def reset_document_counters(self) -> None:
+        # The cache itself is kept, only what it saved is counted per session
+        self._document_hits = 0
+        self._document_misses = 0
+
+    @property
+    def document_hits(self) -> int:
+        return self._document_hits
+
+    @property
+    def document_misses(self) -> int:
+        return self._document_misses
@@ -1,4 +1,6 @@
 from .graphql_client import Client
+from .graphql_client.base_model import UNSET, UnsetType
+from .graphql_client.base_operation import GraphQLField
 from .graphql_client.custom_queries import Query
 from .graphql_client.custom_fields import (
         UserFields,
@@ -11,37 +13,221 @@ from .graphql_client.custom_fields import (
         ProjectV2SingleSelectFieldOptionFields,
         ProjectV2ItemFields,
         ProjectV2ItemConnectionFields,
-        ProjectV2ItemEdgeFields,
+        ProjectV2ItemFieldSingleSelectValueFields,
         MilestoneConnectionFields,
         MilestoneFields,
         IssueTypeConnectionFields,
         IssueTypeFields,
         IssueConnectionFields,
-        IssueEdgeFields,
         IssueFields,
+        PageInfoFields,
         CreateIssuePayloadFields,
         DeleteIssuePayloadFields,
         UpdateIssuePayloadFields,
-        RemoveAssigneesFromAssignablePayloadFields,
-        AddAssigneesToAssignablePayloadFields,
         AddProjectV2ItemByIdPayloadFields,
         UpdateProjectV2ItemFieldValuePayloadFields
 )
 from .graphql_client.custom_mutations import Mutation
+from .graphql_client.exceptions import GraphQLClientGraphQLMultiError
 from .graphql_client.input_types import (
         IssueState,
         CreateIssueInput,
         DeleteIssueInput,
         UpdateIssueInput,
-        RemoveAssigneesFromAssignableInput,
-        AddAssigneesToAssignableInput,
         AddProjectV2ItemByIdInput,
         ProjectV2FieldValue,
         UpdateProjectV2ItemFieldValueInput
 )
 
+from .batch import QlMutationBatch
+from .documents import CachedDocumentClient, QlOperationTemplate
+from .pages import collect_pages, stream_pages
+from .snapshot import hash_body, intern_optional
+from .transport import GitHubRateLimitTransport, RetryMetrics, RetryTransport, environment_transport
+
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from graphql import OperationType
+from dataclasses import dataclass, replace
 from enum import Enum
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Callable, Dict
+
+import httpx
+import sys
+import trio
+
+
+REPOSITORY_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.id,
+        RepositoryFields.name,
+        RepositoryFields.owner().fields(
+            RepositoryOwnerInterface.id,
+            RepositoryOwnerInterface.login
+        )
+    ),
+    ("repository",)
+)
+
+VIEWER_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "viewer",
+    lambda: Query.viewer().fields(
+        UserFields.id,
+        UserFields.login
+    ),
+    ("viewer",)
+)
+
+USER_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "user",
+    lambda login: Query.user(login=login).fields(
+        UserFields.id,
+        UserFields.login
+    ),
+    ("user",)
+)
+
+PROJECTS_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, first: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.projects_v2(first=first).fields(
+            ProjectV2ConnectionFields.nodes().fields(
+                ProjectV2Fields.id,
+                ProjectV2Fields.number,
+                ProjectV2Fields.title
+            )
+        )
+    ),
+    ("repository", "projectsV2", "nodes")
+)
+
+ISSUE_TYPES_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, first: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.issue_types(first=first).fields(
+            IssueTypeConnectionFields.nodes().fields(
+                IssueTypeFields.id,
+                IssueTypeFields.name
+            )
+        )
+    ),
+    ("repository", "issueTypes", "nodes")
+)
+
+ISSUES_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, first, after: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.issues(first=first, after=after).fields(
+            IssueConnectionFields.nodes().fields(
+                IssueFields.assignees(first=100).fields(
+                    UserConnectionFields.nodes().fields(
+                        UserFields.id,
+                        UserFields.login
+                    )
+                ),
+                IssueFields.id,
+                IssueFields.title,
+                IssueFields.closed,
+                IssueFields.body,
+                IssueFields.body_text,
+                IssueFields.created_at,
+                IssueFields.updated_at,
+                IssueFields.closed_at,
+                IssueFields.milestone().fields(
+                    MilestoneFields.id,
+                    MilestoneFields.title,
+                    MilestoneFields.description
+                )
+            ),
+            IssueConnectionFields.page_info().fields(
+                PageInfoFields.has_next_page,
+                PageInfoFields.end_cursor
+            )
+        )
+    ),
+    ("repository", "issues")
+)
+
+MILESTONES_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, first: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.milestones(first=first).fields(
+            MilestoneConnectionFields.nodes().fields(
+                MilestoneFields.id,
+                MilestoneFields.title,
+                MilestoneFields.description
+            )
+        )
+    ),
+    ("repository", "milestones", "nodes")
+)
+
+MILESTONE_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, number: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.milestone(number=number).fields(
+            MilestoneFields.id,
+            MilestoneFields.title,
+            MilestoneFields.description
+        )
+    ),
+    ("repository", "milestone")
+)
+
+PROJECT_FIELD_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, number, field_name: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.project_v2(number=number).fields(
+            ProjectV2Fields.field(name=field_name).on(
+                "ProjectV2SingleSelectField",
+                ProjectV2SingleSelectFieldFields.id
+            )
+        )
+    ),
+    ("repository", "projectV2", "field")
+)
+
+PROJECT_STATUS_OPTIONS_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, number: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.project_v2(number=number).fields(
+            ProjectV2Fields.field(name="Status").on(
+                "ProjectV2SingleSelectField",
+                ProjectV2SingleSelectFieldFields.options().fields(
+                    ProjectV2SingleSelectFieldOptionFields.id,
+                    ProjectV2SingleSelectFieldOptionFields.name
+                )
+            )
+        )
+    ),
+    ("repository", "projectV2", "field", "options")
+)
+
+PROJECT_ITEMS_QUERY = QlOperationTemplate(
+    OperationType.QUERY, "repository",
+    lambda owner, name, number, first, after: Query.repository(owner=owner, name=name).fields(
+        RepositoryFields.project_v2(number=number).fields(
+            ProjectV2Fields.items(first=first, after=after).fields(
+                ProjectV2ItemConnectionFields.nodes().fields(
+                    ProjectV2ItemFields.id,
+                    ProjectV2ItemFields.content.on(
+                        "Issue",
+                        IssueFields.id
+                    ),
+                    ProjectV2ItemFields.field_value_by_name(name="Status").on(
+                        "ProjectV2ItemFieldSingleSelectValue",
+                        ProjectV2ItemFieldSingleSelectValueFields.option_id
+                    )
+                ),
+                ProjectV2ItemConnectionFields.page_info().fields(
+                    PageInfoFields.has_next_page,
+                    PageInfoFields.end_cursor
+                )
+            )
+        )
+    ),
+    ("repository", "projectV2", "items")
+)
 
 
 class QlUser:
@@ -113,12 +299,39 @@ class QlIssueStatus(Enum):
         return cls[status.upper().replace(" ", "_")]
 
 
+@dataclass(frozen=True, slots=True)
+class QlIssueSnapshot:
+    id: str
+    title: str
+    body_hash: int
+    closed: bool
+    assignee_ids: tuple[str, ...]
+    milestone_id: str | None
+    updated_at: str
+
+    @classmethod
+    def from_raw(cls, raw_body: Dict[str, Any]) -> "QlIssueSnapshot":
+        return cls(
+            id=raw_body["id"],
+            title=raw_body["title"],
+            # The markdown source is what we write, prefer it over the rendered text
+            body_hash=hash_body(raw_body.get("body", raw_body["bodyText"])),
+            closed=raw_body["closed"],
+            assignee_ids=tuple(
+                sys.intern(node["id"])
+                for node in raw_body.get("assignees", {}).get("nodes", [])
+            ),
+            milestone_id=intern_optional((raw_body.get("milestone") or {}).get("id")),
+            updated_at=raw_body["updatedAt"]
+        )
+
+
 class QlIssue:
     def __init__(self, client: "GitHubGraphQlClient", raw_body: Dict[str, Any]):
         self._client = client
 
         # If created, assigned users will be empty
-        self._assigned_users = list(
+        self._assigned_users: list[QlUser] | UnsetType = list(
             map(
                 lambda node: QlUser(self._client, node),
                 raw_body.get("assignees", {}).get("nodes", [])
@@ -128,15 +341,36 @@ class QlIssue:
         self._id = raw_body["id"]
         self._title = raw_body["title"]
         self._closed = raw_body["closed"]
-        self._body_text = raw_body["bodyText"]
+        # Same source as the snapshot hash, an untouched body must not read as changed
+        self._body_text: str | UnsetType = raw_body.get("body", raw_body["bodyText"])
         self._created_at = raw_body["createdAt"]
         self._updated_at = raw_body["updatedAt"]
         self._closed_at = raw_body["closedAt"]
-        self._milestone = QlMilestone(self._client, raw_body["milestone"]) \
+        self._milestone: QlMilestone | None | UnsetType = QlMilestone(self._client, raw_body["milestone"]) \
             if ("milestone" in raw_body and raw_body["milestone"] is not None) else None
 
-        self._prev_assigned_users = list(self._assigned_users)
-        self._prev_closed = self._closed
+        # State as fetched, what update() compares against
+        self._snapshot = QlIssueSnapshot.from_raw(raw_body)
+
+    @classmethod
+    def from_snapshot(cls, client: "GitHubGraphQlClient", snapshot: QlIssueSnapshot) -> "QlIssue":
+        issue = cls.__new__(cls)
+        issue._client = client
+
+        # The body, milestone and assignees are not held by the snapshot, update()
+        # leaves them untouched unless they are set in the meantime
+        issue._assigned_users = UNSET
+        issue._id = snapshot.id
+        issue._title = snapshot.title
+        issue._closed = snapshot.closed
+        issue._body_text = UNSET
+        issue._created_at = UNSET
+        issue._updated_at = snapshot.updated_at
+        issue._closed_at = UNSET
+        issue._milestone = UNSET
+
+        issue._snapshot = snapshot
+        return issue
 
     async def delete(self) -> None:
         mutation = Mutation.delete_issue(
@@ -147,71 +381,85 @@ class QlIssue:
 
         await self._client.raw.mutation(mutation, operation_name="deleteIssue")
 
-    async def update(self) -> None:
-        update_input = {
-            "id": self._id,
-            "title": self._title,
-            "body": self._body_text,
-            "milestone_id": self._milestone.id if self._milestone else None
-        }
+    def _diff(self) -> Dict[str, Any]:
+        # Snapshot fields that differ from what was fetched, unset fields are left alone
+        changes: Dict[str, Any] = {}
 
-        if self._closed != self._prev_closed:
-            update_input["state"] = IssueState.CLOSED if self._closed else IssueState.OPEN
+        if self._title != self._snapshot.title:
+            changes["title"] = self._title
 
-        mutation = Mutation.update_issue(
-            UpdateIssueInput(**update_input)
-        ).fields(
-            UpdateIssuePayloadFields.client_mutation_id
-        )
+        if self._closed != self._snapshot.closed:
+            changes["closed"] = self._closed
 
-        await self._client.raw.mutation(mutation, operation_name="updateIssue")
+        if not isinstance(self._body_text, UnsetType):
+            body_hash = hash_body(self._body_text)
 
-        # Get which users were removed
-        removed_users = list(
-            map(lambda user: user.id, filter(
-                lambda user: user not in self._assigned_users,
-                self._prev_assigned_users
-            ))
-        )
+            if body_hash != self._snapshot.body_hash:
+                changes["body_hash"] = body_hash
 
-        if removed_users:
-            mutation = Mutation.remove_assignees_from_assignable(
-                RemoveAssigneesFromAssignableInput(
-                    assignableId=self._id,
-                    assigneeIds=removed_users
-                )
-            ).fields(
-                RemoveAssigneesFromAssignablePayloadFields.client_mutation_id
-            )
+        if not isinstance(self._milestone, UnsetType):
+            milestone_id = self._milestone.id if self._milestone else None
+
+            if milestone_id != self._snapshot.milestone_id:
+                changes["milestone_id"] = intern_optional(milestone_id)
+
+        if not isinstance(self._assigned_users, UnsetType):
+            assignee_ids = tuple(sys.intern(user.id) for user in self._assigned_users)
 
-            await self._client.raw.mutation(mutation, operation_name="removeAssigneesFromAssignable")
+            # GitHub does not order assignees in any way we rely on
+            if sorted(assignee_ids) != sorted(self._snapshot.assignee_ids):
+                changes["assignee_ids"] = assignee_ids
 
-        # Get which users were added
-        added_users = list(
-            map(lambda user: user.id, filter(
-                lambda user: user not in self._prev_assigned_users,
-                self._assigned_users
-            ))
+        return changes
+
+    async def update(self, batch: QlMutationBatch | None = None) -> bool:
+        changes = self._diff()
+
+        if not changes:
+            self._client.count_skipped_mutation()
+            return False
+
+        update_input: Dict[str, Any] = {}
+
+        if "title" in changes:
+            update_input["title"] = self._title
+
+        if "body_hash" in changes:
+            update_input["body"] = self._body_text
+
+        if "milestone_id" in changes:
+            update_input["milestone_id"] = changes["milestone_id"]
+
+        if "closed" in changes:
+            update_input["state"] = IssueState.CLOSED if self._closed else IssueState.OPEN
+
+        # The full list replaces the assignees, covering both additions and removals
+        if "assignee_ids" in changes:
+            update_input["assignee_ids"] = list(changes["assignee_ids"])
+
+        mutation = Mutation.update_issue(
+            UpdateIssueInput(id=self._id, **update_input)
+        ).fields(
+            UpdateIssuePayloadFields.client_mutation_id
         )
 
-        if added_users:
-            mutation = Mutation.add_assignees_to_assignable(
-                AddAssigneesToAssignableInput(
-                    assignableId=self._id,
-                    assigneeIds=list(map(lambda user: user.id, self._assigned_users))
-                )
-            ).fields(
-                AddAssigneesToAssignablePayloadFields.client_mutation_id
-            )
+        await self._client.mutate(mutation, "updateIssue", batch)
 
-            await self._client.raw.mutation(mutation, operation_name="addAssigneesToAssignable")
+        # Batched mutations only go out on flush, which raises if any of them fails,
+        # so the snapshot can already reflect what they will write
+        self._snapshot = replace(self._snapshot, **changes)
+        return True
 
     @property
     def id(self) -> str:
         return self._id
 
     @property
-    def assigned_users(self) -> list[QlUser]:
+    def snapshot(self) -> QlIssueSnapshot:
+        return self._snapshot
+
+    @property
+    def assigned_users(self) -> list[QlUser] | UnsetType:
         return self._assigned_users
 
     @assigned_users.setter
@@ -235,7 +483,7 @@ class QlIssue:
         self._closed = new_closed
 
     @property
-    def body_text(self) -> str:
+    def body_text(self) -> str | UnsetType:
         return self._body_text
 
     @body_text.setter
@@ -243,7 +491,7 @@ class QlIssue:
         self._body_text = new_body_text
 
     @property
-    def milestone(self) -> QlMilestone | None:
+    def milestone(self) -> QlMilestone | None | UnsetType:
         return self._milestone
 
     @milestone.setter
@@ -251,7 +499,7 @@ class QlIssue:
         self._milestone = new_milestone
 
     @property
-    def created_at(self) -> str:
+    def created_at(self) -> str | UnsetType:
         return self._created_at
 
     @property
@@ -259,10 +507,16 @@ class QlIssue:
         return self._updated_at
 
     @property
-    def closed_at(self) -> str | None:
+    def closed_at(self) -> str | None | UnsetType:
         return self._closed_at
 
 
+@dataclass(frozen=True, slots=True)
+class QlProjectItem:
+    id: str
+    status_option_id: str | None
+
+
 class QlProject:
     def __init__(self,
                  client: "GitHubGraphQlClient",
@@ -276,28 +530,28 @@ class QlProject:
 
         self._field_ids: Dict[str, str] = {}
         self._status_field_option_ids: Dict[QlIssueStatus, str] = {}
-        self._issue_item_ids: Dict[str, str] = {}
+
+        # Project items by the node id of their issue
+        self._items: Dict[str, QlProjectItem] = {}
+        self._items_loaded = False
+        # Only an index read from GitHub during this session is trusted to skip adds
+        self._items_verified = False
+
+        # Issues whose add_issue() is still queued, with what to send once their item id is known
+        self._queued_adds: Dict[str, Callable[[str], None] | None] = {}
 
     async def _fetch_field_id(self, field_name: str) -> str:
         if field_name in self._field_ids:
             return self._field_ids[field_name]
 
-        query = Query.repository(
+        field = await PROJECT_FIELD_QUERY.execute(
+            self._client.raw,
             owner=self._repository._owner_login,
-            name=self._repository._name
-        ).fields(
-            RepositoryFields.project_v2(
-                number=self._number
-            ).fields(
-                ProjectV2Fields.field(name=field_name).on(
-                    "ProjectV2SingleSelectField",
-                    ProjectV2SingleSelectFieldFields.id
-                )
-            )
+            name=self._repository._name,
+            number=self._number,
+            field_name=field_name
         )
-
-        response = await self._client.raw.query(query, operation_name="repository")
-        field_id = response["repository"]["projectV2"]["field"]["id"]
+        field_id = field["id"]
 
         self._field_ids[field_name] = field_id
         return field_id
@@ -306,28 +560,16 @@ class QlProject:
         if status in self._status_field_option_ids:
             return self._status_field_option_ids[status]
 
-        query = Query.repository(
+        options = await PROJECT_STATUS_OPTIONS_QUERY.execute(
+            self._client.raw,
             owner=self._repository._owner_login,
-            name=self._repository._name
-        ).fields(
-            RepositoryFields.project_v2(
-                number=self._number
-            ).fields(
-                ProjectV2Fields.field(name="Status").on(
-                    "ProjectV2SingleSelectField",
-                    ProjectV2SingleSelectFieldFields.options().fields(
-                        ProjectV2SingleSelectFieldOptionFields.id,
-                        ProjectV2SingleSelectFieldOptionFields.name
-                    )
-                )
-            )
+            name=self._repository._name,
+            number=self._number
         )
 
-        response = await self._client.raw.query(query, operation_name="repository")
-
         self._status_field_option_ids.update({
             QlIssueStatus.from_string(option["name"]): option["id"]
-            for option in response["repository"]["projectV2"]["field"]["options"]
+            for option in options
         })
 
         if status not in self._status_field_option_ids:
@@ -335,57 +577,58 @@ class QlProject:
 
         return self._status_field_option_ids[status]
 
-    async def _fetch_issue_item_id(self, issue: QlIssue) -> str:
-        if issue.id in self._issue_item_ids:
-            return self._issue_item_ids[issue.id]
-
-        cursor = None
-
-        while True:
-            query = Query.repository(
-                owner=self._repository._owner_login,
-                name=self._repository._name
-            ).fields(
-                RepositoryFields.project_v2(
-                    number=self._number
-                ).fields(
-                    ProjectV2Fields.items(
-                        first=100,
-                        after=cursor
-                    ).fields(
-                        ProjectV2ItemConnectionFields.nodes().fields(
-                            ProjectV2ItemFields.id,
-                            ProjectV2ItemFields.type
-                        ),
-                        ProjectV2ItemConnectionFields.edges().fields(
-                            ProjectV2ItemEdgeFields.cursor
-                        )
+    async def load_items(self) -> None:
+        items: Dict[str, QlProjectItem] = {}
+
+        async with self._client.paginate(PROJECT_ITEMS_QUERY,
+                                         owner=self._repository._owner_login,
+                                         name=self._repository._name,
+                                         number=self._number) as pages:
+            async for nodes in pages:
+                for node in nodes:
+                    content_id = (node.get("content") or {}).get("id")
+
+                    # Draft issues and pull requests are of no interest here
+                    if content_id is None:
+                        continue
+
+                    items[content_id] = QlProjectItem(
+                        id=node["id"],
+                        status_option_id=(node.get("fieldValueByName") or {}).get("optionId")
                     )
-                )
-            )
 
-            response = await self._client.raw.query(query, operation_name="repository")
+        self._items = items
+        self._items_loaded = True
+        self._items_verified = True
 
-            self._issue_item_ids.update({
-                item["id"]: item["id"]
-                for item in response["repository"]["projectV2"]["items"]["nodes"]
-                if item["id"] not in self._issue_item_ids and item["type"] == "ISSUE"
-            })
+    def restore_items(self, items: Dict[str, QlProjectItem]) -> None:
+        self._items = dict(items)
+        self._items_verified = False
 
-            # FIXME: 100 is a hard limit, hardcoded here but fine for our use case
+    def expire_items(self) -> None:
+        # Items may have been removed from the board since the index was read
+        self._items_verified = False
 
-            if len(self._issue_item_ids) >= 100 or not response["repository"]["projectV2"]["items"]["edges"]:
-                break
+    async def _fetch_issue_item_id(self, issue: QlIssue) -> str:
+        item = self._items.get(issue.id)
 
-            cursor = response["repository"]["projectV2"]["items"]["edges"][-1]["cursor"]
+        # Only an index that never saw the whole project is worth rebuilding
+        if item is None and not self._items_loaded:
+            await self.load_items()
+            item = self._items.get(issue.id)
 
-        if issue.id not in self._issue_item_ids:
+        if item is None:
             raise ValueError(f"Issue {issue.id} not found in project {self._title}")
 
-        return self._issue_item_ids[issue.id]
+        return item.id
 
+    async def add_issue(self, issue: QlIssue, batch: QlMutationBatch | None = None) -> None:
+        # Members are known from a verified item index, adding them again would only cost a mutation;
+        # otherwise the add confirms membership, GitHub answers it with the existing item if there is one
+        if issue.id in self._queued_adds or (self._items_verified and issue.id in self._items):
+            self._client.count_skipped_mutation()
+            return
 
-    async def add_issue(self, issue: QlIssue) -> None:
         mutation = Mutation.add_project_v_2_item_by_id(
             AddProjectV2ItemByIdInput(
                 projectId=self._id,
@@ -398,28 +641,83 @@ class QlProject:
             )
         )
 
-        response = await self._client.raw.mutation(mutation, operation_name="addProjectV2Item")
-        issue_item_id = response["addProjectV2ItemById"]["item"]["id"]
+        def on_added(payload: Dict[str, Any]) -> None:
+            issue_item_id = payload["item"]["id"]
+            item = self._items.get(issue.id)
 
-        self._issue_item_ids[issue.id] = issue_item_id
+            # Adding an issue that is already there hands back its existing item
+            if item is None or item.id != issue_item_id:
+                self._items[issue.id] = QlProjectItem(id=issue_item_id, status_option_id=None)
 
-    async def set_issue_status(self, issue: QlIssue, status: QlIssueStatus) -> None:
-        status_field_id: str = await self._fetch_field_id("Status")
+            follow_up = self._queued_adds.pop(issue.id, None)
+
+            if follow_up is not None:
+                follow_up(issue_item_id)
+
+        if batch is not None:
+            self._queued_adds[issue.id] = None
+
+        await self._client.mutate(mutation, "addProjectV2Item", batch, on_added)
+
+    async def add_issues(self, issues: list[QlIssue], batch: QlMutationBatch | None = None) -> None:
+        if batch is None:
+            async with self._client.batch() as own_batch:
+                await self.add_issues(issues, own_batch)
 
-        mutation = Mutation.update_project_v_2_item_field_value(
+            return
+
+        for issue in issues:
+            await self.add_issue(issue, batch)
+
+    def _build_status_mutation(self, issue_item_id: str, status_field_id: str, option_id: str) -> GraphQLField:
+        return Mutation.update_project_v_2_item_field_value(
             UpdateProjectV2ItemFieldValueInput(
                 projectId=self._id,
-                itemId=await self._fetch_issue_item_id(issue),
+                itemId=issue_item_id,
                 fieldId=status_field_id,
                 value=ProjectV2FieldValue(
-                    single_select_option_id=await self._fetch_status_field_option_id(status) # type: ignore
+                    single_select_option_id=option_id # type: ignore
                 )
             )
         ).fields(
             UpdateProjectV2ItemFieldValuePayloadFields.client_mutation_id
         )
 
-        await self._client.raw.mutation(mutation, operation_name="updateProjectV2ItemFieldValue")
+    async def set_issue_status(self, issue: QlIssue, status: QlIssueStatus,
+                               batch: QlMutationBatch | None = None) -> None:
+        status_field_id: str = await self._fetch_field_id("Status")
+        option_id = await self._fetch_status_field_option_id(status)
+
+        def on_status_set(_: Dict[str, Any]) -> None:
+            self._items[issue.id] = replace(self._items[issue.id], status_option_id=option_id)
+
+        # The item id of a queued add_issue() only comes back once it is sent, the status then
+        # rides along with the next flush of the batch, unless the item turned out to have it
+        if batch is not None and issue.id in self._queued_adds:
+            def follow_up(issue_item_id: str) -> None:
+                if self._items[issue.id].status_option_id == option_id:
+                    self._client.count_skipped_mutation()
+                    return
+
+                self._client.defer(
+                    self._build_status_mutation(issue_item_id, status_field_id, option_id),
+                    "updateProjectV2ItemFieldValue", batch, on_status_set
+                )
+
+            self._queued_adds[issue.id] = follow_up
+            return
+
+        item = self._items.get(issue.id)
+
+        if item is not None and item.status_option_id == option_id:
+            self._client.count_skipped_mutation()
+            return
+
+        mutation = self._build_status_mutation(
+            await self._fetch_issue_item_id(issue), status_field_id, option_id
+        )
+
+        await self._client.mutate(mutation, "updateProjectV2ItemFieldValue", batch, on_status_set)
 
     @property
     def id(self) -> str:
@@ -429,6 +727,10 @@ class QlProject:
     def title(self) -> str:
         return self._title
 
+    @property
+    def items(self) -> Dict[str, QlProjectItem]:
+        return self._items
+
 
 class QlRepository:
     def __init__(self, client: "GitHubGraphQlClient", raw_body: Dict[str, Any]):
@@ -441,118 +743,66 @@ class QlRepository:
         self._name = raw_body["name"]
 
     async def get_projects(self, max_projects: int = 100) -> list[QlProject]:
-        query = Query.repository(
+        nodes = await PROJECTS_QUERY.execute(
+            self._client.raw,
             owner=self._owner_login,
-            name=self._name
-        ).fields(
-            RepositoryFields.projects_v2(
-                first=max_projects
-            ).fields(
-                ProjectV2ConnectionFields.nodes().fields(
-                    ProjectV2Fields.id,
-                    ProjectV2Fields.number,
-                    ProjectV2Fields.title
-                )
-            )
+            name=self._name,
+            first=max_projects
         )
 
-        response = await self._client.raw.query(query, operation_name="repository")
-
         return list(
-            map(lambda node: QlProject(self._client, self, node),
-                response["repository"]["projectsV2"]["nodes"])
+            map(lambda node: QlProject(self._client, self, node), nodes)
         )
 
     async def get_issue_types(self, max_types: int = 100) -> list[QlIssueType]:
-        query = Query.repository(
+        nodes = await ISSUE_TYPES_QUERY.execute(
+            self._client.raw,
             owner=self._owner_login,
-            name=self._name
-        ).fields(
-            RepositoryFields.issue_types(
-                first=max_types
-            ).fields(
-                IssueTypeConnectionFields.nodes().fields(
-                    IssueTypeFields.id,
-                    IssueTypeFields.name
-                )
-            )
+            name=self._name,
+            first=max_types
         )
 
-        response = await self._client.raw.query(query, operation_name="repository")
-
         return list(
-            map(lambda node: QlIssueType(self._client, node),
-                response["repository"]["issueTypes"]["nodes"])
+            map(lambda node: QlIssueType(self._client, node), nodes)
         )
 
-    async def get_issues(self) -> list[QlIssue]:
-        transformed_issues = []
-        cursor = None
-
-        while True:
-            query = Query.repository(
-                owner=self._owner_login,
-                name=self._name
-            ).fields(
-                RepositoryFields.issues(
-                    first=100,
-                    after=cursor
-                ).fields(
-                    IssueConnectionFields.nodes().fields(
-                        IssueFields.assignees(first=100).fields(
-                            UserConnectionFields.nodes().fields(
-                                UserFields.id,
-                                UserFields.login
-                            )
-                        ),
-                        IssueFields.id,
-                        IssueFields.title,
-                        IssueFields.closed,
-                        IssueFields.body_text,
-                        IssueFields.created_at,
-                        IssueFields.updated_at,
-                        IssueFields.closed_at,
-                        IssueFields.milestone().fields(
-                            MilestoneFields.id,
-                            MilestoneFields.title,
-                            MilestoneFields.description
-                        )
-                    ),
-                    IssueConnectionFields.edges().fields(
-                        IssueEdgeFields.cursor
-                    )
-                )
-            )
-
-            response = await self._client.raw.query(query, operation_name="repository")
+    async def _resolve_issue_pages(self, pages: AsyncIterator[list[Dict[str, Any]]]) \
+            -> AsyncIterator[list[QlIssue]]:
+        async for nodes in pages:
+            yield [QlIssue(self._client, node) for node in nodes]
 
-            transformed_issues += list(
-                map(lambda node: QlIssue(self._client, node),
-                    response["repository"]["issues"]["nodes"])
-            )
+    @asynccontextmanager
+    async def stream_issues(self) -> AsyncIterator[AsyncIterator[list[QlIssue]]]:
+        async with self._client.paginate(ISSUES_QUERY, owner=self._owner_login, name=self._name) as pages:
+            yield self._resolve_issue_pages(pages)
 
-            # FIXME: 100 is a hard limit, hardcoded here but fine for our use case
-
-            if len(transformed_issues) < 100 or not response["repository"]["issues"]["edges"]:
-                break
-
-            cursor = response["repository"]["issues"]["edges"][-1]["cursor"]
-
-        return transformed_issues
+    async def get_issues(self) -> list[QlIssue]:
+        return await collect_pages(self.stream_issues())
 
-    async def create_issue(self, issue_type: QlIssueType, title: str, body: str) -> QlIssue:
+    async def create_issue(self, issue_type: QlIssueType, title: str, body: str | None,
+                           milestone: QlMilestone | None = None,
+                           assigned_users: list[QlUser] | None = None) -> QlIssue:
         mutation = Mutation.create_issue(
             CreateIssueInput(
                 repositoryId=self._id,
                 title=title,
                 body=body,
-                issueTypeId=issue_type.id
+                issueTypeId=issue_type.id,
+                milestoneId=milestone.id if milestone else None,
+                assigneeIds=[user.id for user in assigned_users or []]
             )
         ).fields(
             CreateIssuePayloadFields.issue().fields(
+                IssueFields.assignees(first=100).fields(
+                    UserConnectionFields.nodes().fields(
+                        UserFields.id,
+                        UserFields.login
+                    )
+                ),
                 IssueFields.id,
                 IssueFields.title,
                 IssueFields.closed,
+                IssueFields.body,
                 IssueFields.body_text,
                 IssueFields.created_at,
                 IssueFields.updated_at,
@@ -570,44 +820,26 @@ class QlRepository:
         return QlIssue(self._client, response["createIssue"]["issue"])
 
     async def get_milestones(self, max_milestones: int = 100) -> list[QlMilestone]:
-        query = Query.repository(
+        nodes = await MILESTONES_QUERY.execute(
+            self._client.raw,
             owner=self._owner_login,
-            name=self._name
-        ).fields(
-            RepositoryFields.milestones(
-                first=max_milestones
-            ).fields(
-                MilestoneConnectionFields.nodes().fields(
-                    MilestoneFields.id,
-                    MilestoneFields.title,
-                    MilestoneFields.description
-                )
-            )
+            name=self._name,
+            first=max_milestones
         )
 
-        response = await self._client.raw.query(query, operation_name="repository")
-
         return list(
-            map(lambda node: QlMilestone(self._client, node),
-                response["repository"]["milestones"]["nodes"])
+            map(lambda node: QlMilestone(self._client, node), nodes)
         )
 
     async def get_milestone(self, milestone_id: int) -> QlMilestone | None:
-        query = Query.repository(
+        milestone = await MILESTONE_QUERY.execute(
+            self._client.raw,
             owner=self._owner_login,
-            name=self._name
-        ).fields(
-            RepositoryFields.milestone(number=milestone_id).fields(
-                MilestoneFields.id,
-                MilestoneFields.title,
-                MilestoneFields.description
-            )
+            name=self._name,
+            number=milestone_id
         )
 
-        response = await self._client.raw.query(query, operation_name="repository")
-
-        return QlMilestone(self._client, response["repository"]["milestone"]) \
-            if response["repository"]["milestone"] else None
+        return QlMilestone(self._client, milestone) if milestone else None
 
     @property
     def id(self) -> str:
@@ -626,49 +858,163 @@ class QlRepository:
         return self._owner_login
 
 
+# Mutations that would run twice if an attempt that failed mid-way went through after all
+NON_IDEMPOTENT_MUTATIONS = (b"createIssue",)
+
+
+def is_idempotent_operation(request: httpx.Request) -> bool:
+    if not request.content.startswith(b'{"query": "mutation'):
+        return True
+
+    return not any(mutation in request.content for mutation in NON_IDEMPOTENT_MUTATIONS)
+
+
 class GitHubGraphQlClient:
+    URL = "https://api.github.com/graphql"
+
+    MUTATION_BATCH_SIZE = 25
+    PAGE_SIZE = 100
+    # Pages fetched ahead of the one being processed
+    PAGE_PREFETCH = 1
+
     def __init__(self, github_token: str):
-        self._client = Client(
-            url="https://api.github.com/graphql",
-            headers={"authorization": f"Bearer {github_token}"}
+        headers = {"authorization": f"Bearer {github_token}"}
+
+        # Requests are paced against the rate limits GitHub reports back, and
+        # transient failures are retried on top of that pacing
+        self._transport = GitHubRateLimitTransport(environment_transport(self.URL))
+        self._retry_transport = RetryTransport(self._transport, is_idempotent=is_idempotent_operation)
+
+        # The few query shapes a crawl uses are rendered once and reused
+        self._client = CachedDocumentClient(
+            url=self.URL,
+            headers=headers,
+            http_client=httpx.AsyncClient(headers=headers, transport=self._retry_transport)
         )
 
-    async def get_repository(self, owner: str, name: str) -> "QlRepository":
-        query = Query.repository(
-            owner=owner,
-            name=name
-        ).fields(
-            RepositoryFields.id,
-            RepositoryFields.name,
-            RepositoryFields.owner().fields(
-                RepositoryOwnerInterface.id,
-                RepositoryOwnerInterface.login
-            )
-        )
+        self._mutations_sent = 0
+        self._mutations_skipped = 0
 
-        response = await self._client.query(query, operation_name="repository")
+    async def get_repository(self, owner: str, name: str) -> "QlRepository":
+        repository = await REPOSITORY_QUERY.execute(self._client, owner=owner, name=name)
 
-        return QlRepository(self, response["repository"])
+        return QlRepository(self, repository)
 
     async def get_viewer(self) -> QlUser:
-        query = Query.viewer().fields(
-            UserFields.id,
-            UserFields.login
-        )
+        viewer = await VIEWER_QUERY.execute(self._client)
 
-        response = await self._client.query(query, operation_name="viewer")
-
-        return QlUser(self, response["viewer"])
+        return QlUser(self, viewer)
 
     async def get_user(self, username_id: str) -> QlUser:
-        query = Query.user(login=username_id).fields(
-            UserFields.id,
-            UserFields.login
-        )
+        user = await USER_QUERY.execute(self._client, login=username_id)
+
+        return QlUser(self, user)
+
+    async def get_users(self, logins: list[str]) -> Dict[str, QlUser | None]:
+        users: Dict[str, QlUser | None] = {}
+
+        for offset in range(0, len(logins), self.PAGE_SIZE):
+            chunk = logins[offset:offset + self.PAGE_SIZE]
+
+            # One aliased lookup per login, all of them in a single document
+            fields = [
+                Query.user(login=login).alias(f"u{idx}").fields(
+                    UserFields.id,
+                    UserFields.login
+                )
+                for idx, login in enumerate(chunk)
+            ]
+
+            try:
+                data = await self._client.query(*fields, operation_name="users")
+            except GraphQLClientGraphQLMultiError as multi_error:
+                # Unknown logins come back as null next to an error on their alias
+                if any(not error.path for error in multi_error.errors):
+                    raise
+
+                data = multi_error.data or {}
 
-        response = await self._client.query(query, operation_name="user")
+            for idx, login in enumerate(chunk):
+                user = data.get(f"u{idx}")
+                users[login] = QlUser(self, user) if user is not None else None
 
-        return QlUser(self, response["user"])
+        return users
+
+    def batch(self, batch_size: int | None = None) -> QlMutationBatch:
+        return QlMutationBatch(self._client, batch_size or self.MUTATION_BATCH_SIZE)
+
+    async def _send_pages(self, template: QlOperationTemplate, arguments: Dict[str, Any],
+                          send_channel: trio.MemorySendChannel[list[Dict[str, Any]]]) -> None:
+        async with send_channel:
+            cursor: str | None = None
+
+            while True:
+                connection = await template.execute(
+                    self._client, first=self.PAGE_SIZE, after=cursor, **arguments
+                )
+
+                # The next request goes out while the consumer works on this page
+                await send_channel.send(connection["nodes"])
+
+                if not connection["pageInfo"]["hasNextPage"]:
+                    return
+
+                cursor = connection["pageInfo"]["endCursor"]
+
+    def paginate(self, template: QlOperationTemplate, **arguments: Any) \
+            -> AbstractAsyncContextManager[trio.MemoryReceiveChannel[list[Dict[str, Any]]]]:
+        return stream_pages(self._send_pages, template, arguments, buffer=self.PAGE_PREFETCH)
+
+    def reset_session(self) -> None:
+        self._mutations_sent = 0
+        self._mutations_skipped = 0
+        self._retry_transport.metrics.reset()
+        self._client.reset_document_counters()
+
+    def count_skipped_mutation(self) -> None:
+        self._mutations_skipped += 1
+
+    def defer(self, mutation: GraphQLField, operation_name: str, batch: QlMutationBatch,
+              on_done: Callable[[Dict[str, Any]], None] | None = None) -> None:
+        self._mutations_sent += 1
+        batch.defer(mutation, on_done)
+
+    async def mutate(self, mutation: GraphQLField, operation_name: str,
+                     batch: QlMutationBatch | None = None,
+                     on_done: Callable[[Dict[str, Any]], None] | None = None) -> None:
+        self._mutations_sent += 1
+
+        if batch is not None:
+            await batch.add(mutation, on_done)
+            return
+
+        # Unbatched mutations go through a batch of their own, so results are handled the same way
+        async with QlMutationBatch(self._client, 1, operation_name) as single:
+            await single.add(mutation, on_done)
+
+    @property
+    def session_mutations_sent(self) -> int:
+        return self._mutations_sent
+
+    @property
+    def session_mutations_skipped(self) -> int:
+        return self._mutations_skipped
+
+    @property
+    def session_documents_reused(self) -> int:
+        return self._client.document_hits
+
+    @property
+    def session_documents_rendered(self) -> int:
+        return self._client.document_misses
+
+    @property
+    def rate_limit(self) -> GitHubRateLimitTransport:
+        return self._transport
+
+    @property
+    def retries(self) -> RetryMetrics:
+        return self._retry_transport.metrics
 
     @property
     def raw(self) -> Client:
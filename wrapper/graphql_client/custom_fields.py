@@ -15026,7 +15026,7 @@ class IssueConnectionFields(GraphQLField):
 
     @classmethod
     def page_info(cls) -> "PageInfoFields":
-        return PageInfoFields("page_info")
+        return PageInfoFields("pageInfo")
 
     total_count: "IssueConnectionGraphQLField" = IssueConnectionGraphQLField(
         "totalCount"
@@ -24241,7 +24241,7 @@ class ProjectV2ItemFields(GraphQLField):
             key: value for key, value in arguments.items() if value["value"] is not None
         }
         return ProjectV2ItemFieldValueUnion(
-            "field_value_by_name", arguments=cleared_arguments
+            "fieldValueByName", arguments=cleared_arguments
         )
 
     @classmethod
@@ -24312,7 +24312,7 @@ class ProjectV2ItemConnectionFields(GraphQLField):
 
     @classmethod
     def page_info(cls) -> "PageInfoFields":
-        return PageInfoFields("page_info")
+        return PageInfoFields("pageInfo")
 
     total_count: "ProjectV2ItemConnectionGraphQLField" = (
         ProjectV2ItemConnectionGraphQLField("totalCount")
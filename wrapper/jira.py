@@ -1,21 +1,76 @@
-import jira
-import jira.resources
+import httpx
+import trio
 
+import math
+import time
+import weakref
+
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Tuple
+from typing import Any, AsyncIterator, Dict, Tuple, TypeVar
+
+from .pages import collect_pages, stream_pages
+from .transport import RetryMetrics, RetryTransport, environment_transport
+
+
+T = TypeVar("T", bound="JiraIssue")
 
 
 class JiraUser:
-    def __init__(self, user: jira.User):
+    def __init__(self, user: Dict[str, Any]):
         self._user = user
 
     @property
     def id(self) -> str:
-        return self._user.accountId
+        return self._user["accountId"]
 
     @property
     def name(self) -> str:
-        return self._user.displayName
+        # Some payloads (e.g. privacy-restricted users) only carry the account ID
+        return self._user.get("displayName", self._user["accountId"])
+
+
+class JiraUserDirectory:
+    def __init__(self, client: "JiraClient", ttl: float = 3600.0):
+        self._client = client
+        self._ttl = ttl
+
+        self._users: dict[str, tuple[JiraUser, float]] = {}
+        self._fetches = 0
+
+    async def resolve(self, user: Dict[str, Any]) -> JiraUser:
+        now = time.monotonic()
+
+        # Embedded user payloads (assignee, reporter...) already carry what we need
+        if "displayName" in user:
+            resolved = JiraUser(user)
+        else:
+            cached = self._users.get(user["accountId"])
+
+            if cached is not None and cached[1] > now:
+                return cached[0]
+
+            self._fetches += 1
+            resolved = JiraUser(await self._client.request("GET", "user", params={
+                "accountId": user["accountId"]
+            }))
+
+        self._users[resolved.id] = (resolved, now + self._ttl)
+        return resolved
+
+    def evict(self) -> None:
+        now = time.monotonic()
+
+        self._users = {
+            account_id: entry
+            for account_id, entry in self._users.items()
+            if entry[1] > now
+        }
+
+    @property
+    def fetches(self) -> int:
+        return self._fetches
 
 
 class JiraIssueStatus(Enum):
@@ -25,8 +80,8 @@ class JiraIssueStatus(Enum):
     DONE = "Done"
 
     @staticmethod
-    def from_jira_status(status: jira.resources.Status) -> "JiraIssueStatus":
-        match status.name.lower():
+    def from_jira_status(status: Dict[str, Any]) -> "JiraIssueStatus":
+        match status["name"].lower():
             case "to-do":
                 return JiraIssueStatus.TODO
             case "in progress":
@@ -36,22 +91,41 @@ class JiraIssueStatus(Enum):
             case "done":
                 return JiraIssueStatus.DONE
             case _:
-                raise ValueError(f"Unknown Jira status: {status.name}")
+                raise ValueError(f"Unknown Jira status: {status['name']}")
 
 
 class JiraIssue:
-    def __init__(self, jira: "JiraClient", issue_id: str):
+    def __init__(self, jira: "JiraClient", issue: Dict[str, Any], complete: bool = True):
         self._jira = jira
-        self._id = issue_id
+        self._id = issue["key"]
+
+        # Nested payloads (e.g. an issue's parent) only carry a subset of the
+        # fields, the rest has to be fetched explicitly
+        self._complete = False
+        self._fields: dict[str, Any] = {}
+        self._hydrate(issue, complete)
+
+        self._epic: "JiraEpic | None" = None
+
+    def _hydrate(self, issue: Dict[str, Any], complete: bool) -> None:
+        fields = issue.get("fields", {})
+
+        self._fields.update({
+            name: fields[name]
+            for name in JiraClient.FIELDS
+            if name in fields
+        })
 
-        issue = self._jira.client.issue(issue_id)
+        self._complete = complete
 
-        self._summary = issue.fields.summary
-        self._description = issue.fields.description or ""
-        self._assignee = issue.fields.assignee
-        self._status = issue.fields.status
+    def _field(self, name: str) -> Any:
+        if name not in self._fields and not self._complete:
+            raise ValueError(f"Field {name} of Jira issue {self._id} is not loaded, fetch it first")
 
-        self._epic = JiraEpic(jira, issue.fields.parent.key) if "parent" in issue.fields.__dict__ else None
+        return self._fields.get(name)
+
+    async def fetch(self, expand: str | None = None) -> None:
+        self._hydrate(await self._jira.fetch_issue(self._id, expand), complete=True)
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, JiraIssue):
@@ -65,69 +139,141 @@ class JiraIssue:
     def id(self) -> str:
         return self._id
 
+    @property
+    def complete(self) -> bool:
+        return self._complete
+
     @property
     def name(self) -> str:
-        return self._summary
+        return self._field("summary")
 
     @property
     def description(self) -> str:
-        return self._description
+        return self._field("description") or ""
 
-    @property
-    def assignee(self) -> JiraUser | None:
-        if self._assignee is None:
+    async def get_assignee(self) -> JiraUser | None:
+        assignee = self._field("assignee")
+
+        if assignee is None:
             return None
 
-        return JiraUser(
-            self._jira.client.user(id=self._assignee.accountId)
-        )
+        return await self._jira.users.resolve(assignee)
 
     @property
     def status(self) -> JiraIssueStatus:
-        return JiraIssueStatus.from_jira_status(self._status)
+        return JiraIssueStatus.from_jira_status(self._field("status"))
+
+    @property
+    def updated(self) -> datetime:
+        return datetime.strptime(self._field("updated"), "%Y-%m-%dT%H:%M:%S.%f%z")
 
     @property
     def epic(self) -> "JiraEpic | None":
+        if self._epic is None:
+            parent = self._field("parent")
+
+            if parent is not None:
+                self._epic = self._jira.resolve_issue(JiraEpic, parent, complete=False)
+
         return self._epic
 
 
 class JiraEpic(JiraIssue):
-    def __init__(self, jira: "JiraClient", epic_id: str):
-        super().__init__(jira, epic_id)
+    def __init__(self, jira: "JiraClient", epic: Dict[str, Any], complete: bool = True):
+        super().__init__(jira, epic, complete)
+
+    @asynccontextmanager
+    async def stream_tasks(self) -> AsyncIterator[AsyncIterator[list[JiraIssue]]]:
+        async with self._jira.search_pages(
+            f'type=Task AND parent={self.id} ORDER BY created ASC'
+        ) as pages:
+            yield self._jira.resolve_pages(JiraIssue, pages)
+
+    async def get_tasks(self) -> list[JiraIssue]:
+        return await collect_pages(self.stream_tasks())
+
+
+class JiraWebhookEventType(Enum):
+    ISSUE_CREATED = "jira:issue_created"
+    ISSUE_UPDATED = "jira:issue_updated"
+    ISSUE_DELETED = "jira:issue_deleted"
+
+
+class JiraWebhookEvent:
+    def __init__(self, event_type: JiraWebhookEventType, issue: Dict[str, Any]):
+        self._type = event_type
+        self._issue = issue
+
+    @staticmethod
+    def from_payload(payload: Dict[str, Any]) -> "JiraWebhookEvent | None":
+        try:
+            event_type = JiraWebhookEventType(payload.get("webhookEvent"))
+        except ValueError:
+            return None
+
+        issue = payload.get("issue")
+
+        if not isinstance(issue, dict) or "key" not in issue or "fields" not in issue:
+            return None
+
+        return JiraWebhookEvent(event_type, issue)
 
     @property
-    def tasks(self) -> list[JiraIssue]:
-        return list(map(lambda issue_id: JiraIssue(self._jira, issue_id.key), # type: ignore
-            self._jira.client.search_issues(
-                f'type=Task AND parent={self.id} ORDER BY created ASC',
-                maxResults=False
-            )
-        ))
+    def type(self) -> JiraWebhookEventType:
+        return self._type
+
+    @property
+    def issue(self) -> Dict[str, Any]:
+        return self._issue
+
+    @property
+    def issue_key(self) -> str:
+        return self._issue["key"]
+
+    @property
+    def issue_type(self) -> str | None:
+        return (self._issue["fields"].get("issuetype") or {}).get("name")
+
+    @property
+    def project_id(self) -> str | None:
+        return (self._issue["fields"].get("project") or {}).get("id")
 
 
 class JiraProject:
-    def __init__(self, client: "JiraClient", project: jira.Project):
+    def __init__(self, client: "JiraClient", project: Dict[str, Any]):
         self._client = client
 
-        self._id = project.id
-        self._key = project.key
-        self._name = project.name
+        self._id = project["id"]
+        self._key = project["key"]
+        self._name = project["name"]
 
-    def get_epics(self) -> list[JiraEpic]:
-        return list(map(lambda issue_id: JiraEpic(self._client, issue_id.key), # type: ignore
-            self._client._client.search_issues(
-                f'project={self.id} AND type=Epic ORDER BY created ASC',
-                maxResults=False
-            )
-        ))
+    def _search_jql(self, issue_type: str, updated_since: datetime | None) -> str:
+        jql = f'project={self.id} AND type={issue_type}'
 
-    def get_issues(self) -> list[JiraIssue]:
-        return list(map(lambda issue_id: JiraIssue(self._client, issue_id.key), # type: ignore
-            self._client._client.search_issues(
-                f'project={self.id} AND type=Task ORDER BY created ASC',
-                maxResults=False
-            )
-        ))
+        # JQL absolute dates are read in the user's timezone, relative ones are not
+        if updated_since is not None:
+            elapsed = datetime.now(timezone.utc) - updated_since
+            jql += f' AND updated >= "-{max(math.ceil(elapsed.total_seconds() / 60), 1)}m"'
+
+        return jql + ' ORDER BY created ASC'
+
+    @asynccontextmanager
+    async def stream_epics(self, updated_since: datetime | None = None) \
+            -> AsyncIterator[AsyncIterator[list[JiraEpic]]]:
+        async with self._client.search_pages(self._search_jql("Epic", updated_since)) as pages:
+            yield self._client.resolve_pages(JiraEpic, pages)
+
+    @asynccontextmanager
+    async def stream_issues(self, updated_since: datetime | None = None) \
+            -> AsyncIterator[AsyncIterator[list[JiraIssue]]]:
+        async with self._client.search_pages(self._search_jql("Task", updated_since)) as pages:
+            yield self._client.resolve_pages(JiraIssue, pages)
+
+    async def get_epics(self, updated_since: datetime | None = None) -> list[JiraEpic]:
+        return await collect_pages(self.stream_epics(updated_since))
+
+    async def get_issues(self, updated_since: datetime | None = None) -> list[JiraIssue]:
+        return await collect_pages(self.stream_issues(updated_since))
 
     @property
     def id(self) -> str:
@@ -143,21 +289,55 @@ class JiraProject:
 
 
 class JiraClient:
+    # Fields requested on every search and fetch, anything else is left on the server
+    FIELDS = ("summary", "description", "assignee", "status", "parent", "updated")
+
+    MAX_CONCURRENT_REQUESTS = 8
+    SEARCH_PAGE_SIZE = 100
+    SEARCH_PREFETCH_PAGES = 4
+
     def __init__(self, server_url: str, token_tuple: Tuple[str, str]):
-        self._client = jira.JIRA(
-            server=server_url,
-            basic_auth=token_tuple
+        base_url = f"{server_url.rstrip('/')}/rest/api/2/"
+
+        # Only reads go through this client, any of them can be retried
+        self._transport = RetryTransport(environment_transport(base_url))
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            auth=token_tuple,
+            headers={"Accept": "application/json"},
+            transport=self._transport
         )
 
-        if len(self._client.projects()) == 0:
+        self._limiter = trio.CapacityLimiter(self.MAX_CONCURRENT_REQUESTS)
+
+        self._base_url: str | None = None
+        self._done_status: Dict[str, Any] | None = None
+
+        self._users = JiraUserDirectory(self)
+
+        # Identity map of the issues built during the current crawl session, weak
+        # so that streamed issues are released once the consumer is done with them
+        self._issues: weakref.WeakValueDictionary[str, JiraIssue] = weakref.WeakValueDictionary()
+        self._issue_hits = 0
+        self._issue_misses = 0
+
+    @classmethod
+    async def create(cls, server_url: str, token_tuple: Tuple[str, str]) -> "JiraClient":
+        client = cls(server_url, token_tuple)
+        await client._connect()
+
+        return client
+
+    async def _connect(self) -> None:
+        if len(await self.request("GET", "project")) == 0:
             raise ValueError("No projects found in the Jira instance. " +
                              "Please check your server URL and/or your authentication token.")
 
         done_status = None
-        statuses = self._client.statuses()
+        statuses = await self.request("GET", "status")
 
         for status in statuses:
-            if status.name.lower() == "done":
+            if status["name"].lower() == "done":
                 done_status = status
                 break
 
@@ -169,24 +349,150 @@ class JiraClient:
             )
 
         self._done_status = done_status
+        self._base_url = (await self.request("GET", "serverInfo"))["baseUrl"]
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> Any:
+        async with self._limiter:
+            response = await self._client.request(method, path, **kwargs)
+
+        response.raise_for_status()
+        return response.json()
+
+    def resolve_issue(self, cls: type[T], issue: Dict[str, Any], complete: bool = True) -> T:
+        cached = self._issues.get(issue["key"])
+
+        if isinstance(cached, cls):
+            self._issue_hits += 1
+
+            # A complete payload is never older than what we already hold
+            if complete:
+                cached._hydrate(issue, complete)
+
+            return cached
+
+        self._issue_misses += 1
+
+        resolved = cls(self, issue, complete)
+        self._issues[issue["key"]] = resolved
+
+        return resolved
+
+    async def resolve_pages(self, cls: type[T],
+                            pages: AsyncIterator[list[Dict[str, Any]]]) -> AsyncIterator[list[T]]:
+        async for page in pages:
+            yield [self.resolve_issue(cls, issue) for issue in page]
+
+    def reset_session(self) -> None:
+        self._issues.clear()
+        self._issue_hits = 0
+        self._issue_misses = 0
+        self._transport.metrics.reset()
 
-    def get_project(self, project_id: str) -> JiraProject | None:
+        self._users.evict()
+
+    async def _search_page(self, jql: str, start_at: int, max_results: int,
+                           expand: str | None) -> Dict[str, Any]:
+        return await self.request("GET", "search", params={
+            "jql": jql,
+            "startAt": start_at,
+            "maxResults": max_results,
+            "fields": ",".join(self.FIELDS),
+            **({"expand": expand} if expand else {})
+        })
+
+    async def _send_pages(self, jql: str, expand: str | None,
+                          send_channel: trio.MemorySendChannel[list[Dict[str, Any]]]) -> None:
+        async with send_channel:
+            first_page = await self._search_page(jql, 0, self.SEARCH_PAGE_SIZE, expand)
+
+            # The server may cap maxResults below what we asked, stick to what it gave
+            page_size = len(first_page["issues"])
+
+            if page_size == 0:
+                await send_channel.send(first_page["issues"])
+                return
+
+            windows = range(page_size, first_page["total"], page_size)
+
+            pages: dict[int, list[Dict[str, Any]]] = {}
+            ready = {start_at: trio.Event() for start_at in windows}
+
+            # Bounds how many pages are held in memory ahead of the consumer
+            slots = trio.Semaphore(self.SEARCH_PREFETCH_PAGES)
+
+            async def fetch_page(start_at: int) -> None:
+                pages[start_at] = (await self._search_page(jql, start_at, page_size, expand))["issues"]
+                ready[start_at].set()
+
+            async def schedule_pages(nursery: trio.Nursery) -> None:
+                # Windows are started in order, so the next one to send always gets a slot
+                for start_at in windows:
+                    await slots.acquire()
+                    nursery.start_soon(fetch_page, start_at)
+
+            async with trio.open_nursery() as nursery:
+                nursery.start_soon(schedule_pages, nursery)
+
+                # The next windows are already fetched while the first page waits for its consumer
+                await send_channel.send(first_page["issues"])
+
+                for start_at in windows:
+                    await ready[start_at].wait()
+                    await send_channel.send(pages.pop(start_at))
+                    slots.release()
+
+    def search_pages(self, jql: str, expand: str | None = None) \
+            -> AbstractAsyncContextManager[trio.MemoryReceiveChannel[list[Dict[str, Any]]]]:
+        return stream_pages(self._send_pages, jql, expand)
+
+    async def search_issues(self, jql: str, expand: str | None = None) -> list[Dict[str, Any]]:
+        return await collect_pages(self.search_pages(jql, expand))
+
+    async def fetch_issue(self, issue_id: str, expand: str | None = None) -> Dict[str, Any]:
+        return await self.request("GET", f"issue/{issue_id}", params={
+            "fields": ",".join(self.FIELDS),
+            **({"expand": expand} if expand else {})
+        })
+
+    async def get_project(self, project_id: str) -> JiraProject | None:
         try:
-            return JiraProject(self, self._client.project(project_id))
-        except jira.JIRAError as e:
-            if e.status_code == 404:
+            return JiraProject(self, await self.request("GET", f"project/{project_id}"))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
                 return None
 
             raise e
 
     @property
-    def client(self) -> jira.JIRA:
+    def client(self) -> httpx.AsyncClient:
         return self._client
 
     @property
     def base_url(self) -> str:
-        return self._client.server_info()["baseUrl"]
+        if self._base_url is None:
+            raise ValueError("Jira client is not connected")
+
+        return self._base_url
 
     @property
-    def done_status(self) -> jira.resources.Status:
+    def users(self) -> JiraUserDirectory:
+        return self._users
+
+    @property
+    def session_hits(self) -> int:
+        return self._issue_hits
+
+    @property
+    def session_misses(self) -> int:
+        return self._issue_misses
+
+    @property
+    def retries(self) -> RetryMetrics:
+        return self._transport.metrics
+
+    @property
+    def done_status(self) -> Dict[str, Any]:
+        if self._done_status is None:
+            raise ValueError("Jira client is not connected")
+
         return self._done_status
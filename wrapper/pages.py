@@ -0,0 +1,33 @@
+import trio
+
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+
+P = TypeVar("P")
+
+
+@asynccontextmanager
+async def stream_pages(send_pages: Callable[..., Awaitable[None]], *args: Any,
+                       buffer: int = 0) -> AsyncIterator[trio.MemoryReceiveChannel[Any]]:
+    # send_pages(*args, send_channel) fetches in the background and closes the channel once done
+    send_channel, receive_channel = trio.open_memory_channel[Any](buffer)
+
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(send_pages, *args, send_channel)
+
+        try:
+            yield receive_channel
+        finally:
+            # The consumer may stop early, do not leave page fetches behind
+            nursery.cancel_scope.cancel()
+
+
+async def collect_pages(stream: AbstractAsyncContextManager[AsyncIterator[list[P]]]) -> list[P]:
+    items: list[P] = []
+
+    async with stream as pages:
+        async for page in pages:
+            items += page
+
+    return items
@@ -0,0 +1,11 @@
+import hashlib
+import sys
+
+
+def hash_body(body: str | None) -> int:
+    # Stable across processes, unlike hash(), so records can be compared between runs
+    return int.from_bytes(hashlib.blake2b((body or "").encode(), digest_size=8).digest())
+
+
+def intern_optional(value: str | None) -> str | None:
+    return sys.intern(value) if value is not None else None
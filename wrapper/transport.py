@@ -0,0 +1,294 @@
+import httpx
+import trio
+
+import random
+import time
+import urllib.request
+
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable
+
+
+def environment_transport(url: str) -> httpx.AsyncHTTPTransport:
+    # httpx only looks up HTTP(S)_PROXY and NO_PROXY when it builds the transport itself,
+    # wrapping transports have to do it for the host their client talks to
+    target = httpx.URL(url)
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get(target.scheme) or proxies.get("all")
+
+    if proxy is None or urllib.request.proxy_bypass(target.host):
+        return httpx.AsyncHTTPTransport()
+
+    return httpx.AsyncHTTPTransport(proxy=proxy)
+
+
+# GitHub asks to wait at least a minute on a secondary limit that does not say how long
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+
+
+def is_secondary_rate_limit(response: httpx.Response) -> bool:
+    # These 403s often carry neither Retry-After nor an exhausted budget, only their message does
+    return response.status_code == 403 and b"secondary rate limit" in response.content.lower()
+
+
+def secondary_rate_limit_delay() -> float:
+    # Jittered so that everything that hit the limit together does not come back together
+    return SECONDARY_RATE_LIMIT_WAIT + random.uniform(0, SECONDARY_RATE_LIMIT_WAIT / 2)
+
+
+class GitHubRateLimitTransport(httpx.AsyncBaseTransport):
+    # Points left alone for whatever else shares the token
+    RESERVED_POINTS = 50
+    # Below this share of the budget, requests are spread over the rest of the window
+    PACING_THRESHOLD = 0.1
+    MAX_CONCURRENT_REQUESTS = 10
+    # GitHub asks for at least a second between requests that write content
+    MUTATION_INTERVAL = 1.0
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+        self._limiter = trio.CapacityLimiter(self.MAX_CONCURRENT_REQUESTS)
+
+        # Monotonic clock times, the transport outlives the trio.run() whose clock it would be on
+        self._slot_lock = trio.Lock()
+        self._next_request_at = 0.0
+        self._next_mutation_at = 0.0
+
+        # As last reported by GitHub, reset times are epoch seconds
+        self._limit: int | None = None
+        self._remaining: int | None = None
+        self._reset_at: float | None = None
+        self._paused_until = 0.0
+
+    @staticmethod
+    def _is_mutation(request: httpx.Request) -> bool:
+        # The generated client always serializes the query first
+        return request.content[:32].startswith(b'{"query": "mutation')
+
+    def _pacing(self, now: float) -> tuple[float, float]:
+        # How long until requests may go out at all, then how far apart they should be
+        if self._paused_until > now:
+            return self._paused_until - now, 0.0
+
+        if self._remaining is None or self._reset_at is None or self._reset_at <= now:
+            return 0.0, 0.0
+
+        if self._remaining <= self.RESERVED_POINTS:
+            return self._reset_at - now, 0.0
+
+        if self._limit and self._remaining < self._limit * self.PACING_THRESHOLD:
+            return 0.0, (self._reset_at - now) / (self._remaining - self.RESERVED_POINTS)
+
+        return 0.0, 0.0
+
+    def _reserve_slot(self, is_mutation: bool) -> float:
+        now = time.monotonic()
+        wait, interval = self._pacing(time.time())
+
+        # Each request takes the next free slot, so concurrent ones are spaced out rather than all
+        # sleeping the same delay and going out together
+        start_at = max(now + wait, self._next_request_at)
+        self._next_request_at = start_at + interval
+
+        if is_mutation:
+            start_at = max(start_at, self._next_mutation_at)
+            self._next_mutation_at = start_at + self.MUTATION_INTERVAL
+
+        return max(0.0, start_at - now)
+
+    def _record(self, response: httpx.Response) -> None:
+        headers = response.headers
+
+        if "x-ratelimit-remaining" in headers:
+            self._limit = int(headers.get("x-ratelimit-limit", self._limit or 0))
+            self._remaining = int(headers["x-ratelimit-remaining"])
+            self._reset_at = float(headers.get("x-ratelimit-reset", 0)) or None
+
+        if response.status_code not in (403, 429):
+            return
+
+        # Secondary limits say how long to back off, an exhausted budget waits for its reset
+        if "retry-after" in headers:
+            self._paused_until = time.time() + float(headers["retry-after"])
+        elif self._remaining == 0 and self._reset_at is not None:
+            self._paused_until = self._reset_at
+        elif is_secondary_rate_limit(response):
+            self._paused_until = time.time() + secondary_rate_limit_delay()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with self._limiter:
+            async with self._slot_lock:
+                delay = self._reserve_slot(self._is_mutation(request))
+
+            if delay > 0:
+                await trio.sleep(delay)
+
+            response = await self._transport.handle_async_request(request)
+
+            # Rate limit errors are small, their message tells which limit was hit
+            if response.status_code == 403:
+                await response.aread()
+
+            self._record(response)
+
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    @property
+    def limit(self) -> int | None:
+        return self._limit
+
+    @property
+    def remaining(self) -> int | None:
+        return self._remaining
+
+    @property
+    def reset_at(self) -> datetime | None:
+        return datetime.fromtimestamp(self._reset_at, timezone.utc) if self._reset_at else None
+
+
+class RetryMetrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._requests = 0
+        self._retries: Counter[str] = Counter()
+        self._exhausted = 0
+        self._waited = 0.0
+
+    def _record_retry(self, reason: str, delay: float) -> None:
+        self._retries[reason] += 1
+        self._waited += delay
+
+    @property
+    def requests(self) -> int:
+        return self._requests
+
+    @property
+    def retries(self) -> int:
+        return sum(self._retries.values())
+
+    @property
+    def retries_by_reason(self) -> dict[str, int]:
+        return dict(self._retries)
+
+    @property
+    def exhausted(self) -> int:
+        return self._exhausted
+
+    @property
+    def waited(self) -> float:
+        return self._waited
+
+
+def is_idempotent_method(request: httpx.Request) -> bool:
+    return request.method in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    RETRIABLE_STATUSES = (500, 502, 503, 504)
+    RATE_LIMIT_STATUSES = (403, 429)
+    MAX_RETRIES = 4
+    # Longest an operation may spend waiting between its attempts, in seconds, enough
+    # for a few secondary rate limits
+    RETRY_BUDGET = 300.0
+    BACKOFF_BASE = 0.5
+    BACKOFF_CAP = 30.0
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None,
+                 is_idempotent: Callable[[httpx.Request], bool] = is_idempotent_method):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._is_idempotent = is_idempotent
+
+        self._metrics = RetryMetrics()
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        if "retry-after" in response.headers:
+            try:
+                return max(0.0, float(response.headers["retry-after"]))
+            except ValueError:
+                return None
+
+        # An exhausted primary budget only comes back at its reset
+        if response.headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in response.headers:
+            return max(0.0, float(response.headers["x-ratelimit-reset"]) - time.time())
+
+        return None
+
+    def _classify(self, request: httpx.Request, response: httpx.Response) -> tuple[str | None, float | None]:
+        retry_after = self._retry_after(response)
+
+        # Rate limited requests were never processed, whatever they would have done
+        if response.status_code in self.RATE_LIMIT_STATUSES and (response.status_code == 429 or retry_after is not None):
+            return "rate_limited", retry_after
+
+        if is_secondary_rate_limit(response):
+            return "rate_limited", secondary_rate_limit_delay()
+
+        if response.status_code in self.RETRIABLE_STATUSES and self._is_idempotent(request):
+            return f"http_{response.status_code}", retry_after
+
+        return None, None
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps concurrent retries from landing together
+        return random.uniform(0, min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2 ** attempt))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._metrics._requests += 1
+        waited = 0.0
+        attempt = 0
+
+        while True:
+            response: httpx.Response | None = None
+            error: Exception | None = None
+
+            try:
+                response = await self._transport.handle_async_request(request)
+
+                if response.status_code == 403:
+                    await response.aread()
+
+                reason, delay = self._classify(request, response)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as exception:
+                # The request may have gone through, only repeat what is safe to repeat
+                if not self._is_idempotent(request):
+                    raise
+
+                error = exception
+                reason, delay = type(exception).__name__, None
+
+            if reason is None and response is not None:
+                return response
+
+            delay = delay if delay is not None else self._backoff(attempt)
+
+            if attempt >= self.MAX_RETRIES or waited + delay > self.RETRY_BUDGET:
+                self._metrics._exhausted += 1
+
+                if error is not None:
+                    raise error
+
+                return response  # type: ignore
+
+            if response is not None:
+                await response.aclose()
+
+            self._metrics._record_retry(reason or "unknown", delay)
+            await trio.sleep(delay)
+
+            waited += delay
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    @property
+    def metrics(self) -> RetryMetrics:
+        return self._metrics